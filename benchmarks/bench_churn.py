@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+""" bench_churn.py: Runs ProcessesController over an evolving synthetic /proc tree with fork/exit churn. """
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from sysinfo import Process, ProcessesController, Uptime  # noqa: E402
+from fake_procfs import ProcfsSimulator  # noqa: E402
+
+SYSINFO = os.path.join(ROOT, 'src', 'sysinfo.py')
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def traced_sysinfo_bytes():
+    """Bytes allocated by sysinfo.py (the controller and its processes) which are still alive."""
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(True, SYSINFO)])
+    return sum(statistic.size for statistic in snapshot.statistics('filename'))
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--pids', type=int, default=2000, help='long-lived processes at start')
+    argparser.add_argument('--forks', type=int, default=500, help='short-lived shells started per tick')
+    argparser.add_argument('--exits', type=int, default=5, help='long-lived processes restarted per tick')
+    argparser.add_argument('--pid-max', type=int, default=32768)
+    argparser.add_argument('--ticks', type=int, default=200)
+    argparser.add_argument('--soak', action='store_true', help='run 100k ticks (unless --ticks is given)')
+    argparser.add_argument('--warmup', type=int, default=10, help='ticks before memory is measured')
+    argparser.add_argument('--output', help='JSON file with results')
+    argparser.add_argument('--options', default='', help='comma separated ProcessesController flags, '
+                                                         'e.g. persistent_files,adaptive_sampling')
+    options = argparser.parse_args()
+    ticks = 100000 if options.soak and '--ticks' not in sys.argv else options.ticks
+    flags = {name: True for name in options.options.split(',') if name}
+
+    with tempfile.TemporaryDirectory() as root:
+        simulator = ProcfsSimulator(root, options.pids, pid_max=options.pid_max)
+        ProcessesController._proc_folder = root + '/'
+        Process._proc_folder = root
+        Uptime._proc_folder = root
+
+        tracemalloc.start()
+        processes = ProcessesController(Uptime(), 16 * 1024 * 1024, **flags)
+        latencies = []
+        baseline = None
+        try:
+            for tick in range(ticks):
+                simulator.tick(forks=options.forks, exits=options.exits)
+                start = time.perf_counter()
+                processes.update()
+                latencies.append(time.perf_counter() - start)
+                assert processes.proccesses_number == len(simulator.pids), f'table out of sync at tick {tick}'
+
+                if tick + 1 == options.warmup:
+                    baseline = traced_sysinfo_bytes()
+                if ticks >= 100 and (tick + 1) % (ticks // 10) == 0:
+                    print(f'tick {tick + 1}: {len(simulator.pids)} processes, '
+                          f'p99 {percentile(latencies, 99) * 1000:.1f} ms')
+            growth = traced_sysinfo_bytes() - baseline if baseline is not None else None
+        finally:
+            processes.close()
+            tracemalloc.stop()
+
+    measured = max(ticks - options.warmup, 1)
+    result = {
+        'ticks': ticks, 'pids': options.pids, 'forks_per_tick': options.forks, 'exits_per_tick': options.exits,
+        'pid_max': options.pid_max, 'options': sorted(flags), 'forked': simulator.forked, 'exited': simulator.exited,
+        'latency_ms': {'p50': percentile(latencies, 50) * 1000, 'p90': percentile(latencies, 90) * 1000,
+                       'p99': percentile(latencies, 99) * 1000, 'max': max(latencies) * 1000,
+                       'mean': statistics.fmean(latencies) * 1000},
+        'memory_growth_bytes': growth,
+        'memory_growth_bytes_per_tick': growth / measured if growth is not None else None,
+    }
+    latency = result['latency_ms']
+    print(f'{ticks} ticks, {simulator.forked} forks, {simulator.exited} exits: update p50 {latency["p50"]:.1f} ms, '
+          f'p90 {latency["p90"]:.1f} ms, p99 {latency["p99"]:.1f} ms, max {latency["max"]:.1f} ms')
+    if growth is not None:
+        print(f'sysinfo memory growth after warmup: {growth} bytes ({result["memory_growth_bytes_per_tick"]:.1f} '
+              f'bytes/tick)')
+    if options.output:
+        with open(options.output, 'w') as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
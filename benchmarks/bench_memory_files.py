@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+""" bench_memory_files.py: Compares reading memory figures from /proc/[pid]/status and /proc/[pid]/statm. """
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from sysinfo import Process  # noqa: E402
+from fake_procfs import build_proc_tree  # noqa: E402
+
+
+def read_status(folder, pid):
+    with open(f'{folder}/{pid}/status', 'rb') as file:
+        status = Process._parse_status(file.read())
+    return status.get('VmSize', 0), status.get('VmRSS', 0), status.get('RssShmem', 0)
+
+
+def read_statm(folder, pid):
+    with open(f'{folder}/{pid}/statm', 'rb') as file:
+        return Process._parse_statm(file.read())
+
+
+def bench(folder, pids, number):
+    for name, func in (('status', read_status), ('statm', read_statm)):
+        best = None
+        for _ in range(number):
+            start = time.perf_counter()
+            for pid in pids:
+                func(folder, pid)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f'{folder:>24.24} {len(pids):6d} pids, {name:>6}: {best * 1000:8.2f} ms/pass, '
+              f'{best * 1e6 / len(pids):6.2f} us/file')
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--pids', type=int, default=10000)
+    argparser.add_argument('--number', type=int, default=5)
+    options = argparser.parse_args()
+
+    live = [name for name in os.listdir('/proc') if name.isdigit() and os.path.exists(f'/proc/{name}/statm')]
+    bench('/proc', live, options.number)
+    with tempfile.TemporaryDirectory() as root:
+        bench(root, build_proc_tree(root, options.pids), options.number)
+
+
+if __name__ == '__main__':
+    main()
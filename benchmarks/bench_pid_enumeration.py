@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+""" bench_pid_enumeration.py: Compares listdir() + isdir() and scandir() enumeration of /proc. """
+
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from sysinfo import ProcessesController  # noqa: E402
+from fake_procfs import build_proc_tree  # noqa: E402
+
+
+def listdir_pids(folder):
+    """Set comprehension used before ProcessesController._read_pids() (PIDs only, no owner)."""
+    return {name for name in os.listdir(folder) if os.path.isdir(folder + name) and name.isdigit()}
+
+
+def scandir_pids(folder):
+    ProcessesController._proc_folder = folder
+    return ProcessesController._read_pids()
+
+
+def bench(folder, number):
+    pids = len(listdir_pids(folder))
+    for name, func in (('listdir + isdir', listdir_pids), ('scandir + owner', scandir_pids)):
+        seconds = timeit.timeit(lambda: func(folder), number=number) / number
+        print(f'{folder:>24.24} {pids:6d} pids, {name}: {seconds * 1000:7.2f} ms')
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--pids', type=int, default=10000)
+    argparser.add_argument('--number', type=int, default=20)
+    options = argparser.parse_args()
+
+    bench('/proc/', options.number)
+    with tempfile.TemporaryDirectory() as root:
+        build_proc_tree(root, options.pids)
+        bench(root + '/', options.number)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+""" bench_process_memory.py: Measures memory used by Process objects built from a synthetic /proc tree. """
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from sysinfo import Process, Uptime  # noqa: E402
+from fake_procfs import build_proc_tree  # noqa: E402
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--pids', type=int, default=50000)
+    argparser.add_argument('--budget', type=int, default=512, help='bytes allowed per Process object')
+    options = argparser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        # all processes share the same command line, as workers of a pool do
+        pids = build_proc_tree(root, options.pids)
+        Process._proc_folder = root
+        Process.set_uptime(Uptime())
+        Process.set_memory_info(16 * 1024 * 1024)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        before, _ = tracemalloc.get_traced_memory()
+        processes = [Process(str(pid)) for pid in pids]
+        after, _ = tracemalloc.get_traced_memory()
+        elapsed = time.perf_counter() - start
+        tracemalloc.stop()
+
+    per_process = (after - before - sys.getsizeof(processes)) / len(processes)
+    print(f'{len(processes)} processes: {per_process:.0f} bytes/process, {elapsed:.1f} s to build')
+    assert per_process <= options.budget, f'{per_process:.0f} bytes/process exceeds budget of {options.budget}'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+""" bench_scaling.py: Times update, sorting, snapshots and rendering on synthetic /proc trees of growing size. """
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from sysinfo import Cpu, LoadAverage, MemInfo, Process, ProcessesController, SnapshotCollector, Uptime  # noqa: E402
+from pytop import ProcessPanel  # noqa: E402
+from fake_procfs import build_procfs  # noqa: E402
+
+
+def use_procfs(root):
+    """Points all data sources at the /proc tree in root."""
+    for source in (Cpu, LoadAverage, MemInfo, Uptime, Process):
+        source._proc_folder = root
+    ProcessesController._proc_folder = root + '/'
+
+
+def best_of(ticks, func):
+    """Returns the shortest of ticks runs of func in seconds."""
+    best = None
+    for _ in range(ticks):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench(pids, ticks):
+    result = {'pids': pids}
+    with tempfile.TemporaryDirectory() as root:
+        start = time.perf_counter()
+        build_procfs(root, pids)
+        result['build_s'] = time.perf_counter() - start
+        use_procfs(root)
+
+        cpu, memory, uptime, load = Cpu(), MemInfo(), Uptime(), LoadAverage()
+        start = time.perf_counter()
+        processes = ProcessesController(uptime, memory.total_memory)
+        result['first_update_s'] = time.perf_counter() - start
+        try:
+            result['update_s'] = best_of(ticks, processes.update)
+            result['pids_per_s'] = pids / result['update_s']
+
+            # CPU usage of the static tree is 0, memory figures differ
+            processes.set_sort_key('resident_memory', reverse=True)
+            result['sort_s'] = best_of(ticks, lambda: processes.processes)
+
+            collector = SnapshotCollector(cpu, memory, uptime, load, processes)
+            result['snapshot_s'] = best_of(ticks, lambda: collector._take(Process.clock()))
+
+            snapshot = collector.snapshot
+            columns = [Process.columns[name] for name in Process.default_columns]
+            panel = ProcessPanel(snapshot, columns)
+
+            def render():
+                # a new snapshot and a paint of one terminal screen, as after a refresh
+                panel.refresh(snapshot)
+                panel.render((200, 50), focus=True)
+
+            result['render_s'] = best_of(ticks, render)
+        finally:
+            processes.close()
+    return result
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--pids', type=int, nargs='+', default=[1000, 10000, 100000])
+    argparser.add_argument('--ticks', type=int, default=3)
+    argparser.add_argument('--output', help='JSON file with results (printed if not given)')
+    argparser.add_argument('--baseline', help='JSON file of a previous run to compare scan throughput with')
+    argparser.add_argument('--tolerance', type=float, default=0.2, help='allowed throughput drop from baseline')
+    options = argparser.parse_args()
+
+    results = []
+    for pids in options.pids:
+        result = bench(pids, options.ticks)
+        print(f'{pids:7d} pids: update {result["update_s"] * 1000:8.1f} ms ({result["pids_per_s"]:8.0f} pids/s), '
+              f'sort {result["sort_s"] * 1000:7.1f} ms, snapshot {result["snapshot_s"] * 1000:7.1f} ms, '
+              f'render {result["render_s"] * 1000:8.1f} ms')
+        results.append(result)
+
+    report = {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count(),
+              'ticks': options.ticks, 'results': results}
+    if options.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(options.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f'results written to {options.output}')
+
+    if options.baseline:
+        with open(options.baseline) as file:
+            baseline = {result['pids']: result for result in json.load(file)['results']}
+        for result in results:
+            previous = baseline.get(result['pids'])
+            if previous is None:
+                continue
+            ratio = result['pids_per_s'] / previous['pids_per_s']
+            print(f'{result["pids"]:7d} pids: {ratio:.2f}x of baseline throughput')
+            assert ratio >= 1 - options.tolerance, f'scan throughput of {result["pids"]} pids dropped to {ratio:.2f}x'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+""" bench_scan_threads.py: Compares sequential, thread pool and process pool scans on a synthetic /proc tree. """
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from sysinfo import Process, ProcessesController, Uptime  # noqa: E402
+from fake_procfs import build_proc_tree  # noqa: E402
+
+
+def time_updates(ticks, scan_threads=0, scan_processes=0):
+    controller = ProcessesController(Uptime(), 16 * 1024 * 1024, scan_threads=scan_threads,
+                                     scan_processes=scan_processes)
+    try:
+        start = time.perf_counter()
+        for _ in range(ticks):
+            controller.update()
+        return (time.perf_counter() - start) / ticks
+    finally:
+        controller.close()
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--pids', type=int, default=10000)
+    argparser.add_argument('--ticks', type=int, default=5)
+    argparser.add_argument('--threads', type=int, nargs='+', default=[2, 4, 8])
+    argparser.add_argument('--processes', type=int, nargs='*', default=[2, 4])
+    options = argparser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        build_proc_tree(root, options.pids)
+        ProcessesController._proc_folder = root + '/'
+        Process._proc_folder = root
+
+        sequential = time_updates(options.ticks)
+        print(f'{options.pids} pids, sequential: {sequential * 1000:8.1f} ms/update')
+        for threads in options.threads:
+            elapsed = time_updates(options.ticks, scan_threads=threads)
+            print(f'{options.pids} pids, {threads:2d} threads: {elapsed * 1000:8.1f} ms/update '
+                  f'(speedup {sequential / elapsed:.2f}x)')
+        for processes in options.processes:
+            elapsed = time_updates(options.ticks, scan_processes=processes)
+            print(f'{options.pids} pids, {processes:2d} processes: {elapsed * 1000:6.1f} ms/update '
+                  f'(speedup {sequential / elapsed:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
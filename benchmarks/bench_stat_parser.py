@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+""" bench_stat_parser.py: Micro-benchmark of /proc/[pid]/stat parsing. """
+
+import glob
+import os
+import sys
+import timeit
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from sysinfo import Process  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, 'tests', 'test_sysinfo', 'processes')
+
+
+def legacy_parse(data):
+    """Text split parser used before Process._parse_stat()."""
+    values = ['Reserved']
+    values += data.decode().split()
+    return (values[2][1:-1], values[3], int(values[9]), sum(map(int, values[14:18])),
+            values[18], values[19], int(values[22]))
+
+
+def bytes_parse(data):
+    return Process._parse_stat(data)
+
+
+def load_fixtures():
+    stats = []
+    for filename in sorted(glob.glob(os.path.join(FIXTURES, '*', '*', 'stat'))):
+        with open(filename, 'rb') as file:
+            stats.append(file.read())
+    return stats
+
+
+def peak_bytes(parser, stats):
+    """Average peak of memory allocated while parsing one stat file."""
+    peaks = []
+    tracemalloc.start()
+    for data in stats:
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        parser(data)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - start)
+    tracemalloc.stop()
+    return sum(peaks) / len(peaks)
+
+
+def main(number=20000):
+    stats = load_fixtures()
+    print(f'{len(stats)} stat fixtures, {number} iterations')
+
+    for name, parser in (('legacy text split', legacy_parse), ('bytes parser', bytes_parse)):
+        seconds = timeit.timeit(lambda: [parser(data) for data in stats], number=number)
+        per_parse_us = seconds * 1e6 / (number * len(stats))
+        print(f'{name:>18}: {per_parse_us:6.2f} us/parse, '
+              f'{peak_bytes(parser, stats):6.0f} peak bytes/parse')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+""" fake_procfs.py: Builds synthetic /proc trees for benchmarks. """
+
+import os
+import random
+import shutil
+
+STAT = ('{pid} ({comm}) {state} {ppid} {pid} {pid} 0 -1 {flags} 118336 0 1047 0 {utime} {stime} 0 0 {priority} '
+        '{nice} {threads} 0 {starttime} {vsize} {rss_pages} 18446744073709551615 1 1 0 0 0 0 671173123 4096 1260 0 0 0 '
+        '17 3 0 0 99 0 0 0 0 0 0 0 0 0 0\n')
+
+STATUS = ('Name:\t{comm}\nUmask:\t0022\nState:\tS (sleeping)\nTgid:\t{pid}\nNgid:\t0\nPid:\t{pid}\nPPid:\t1\n'
+          'TracerPid:\t0\nUid:\t{uid}\t{uid}\t{uid}\t{uid}\nGid:\t{uid}\t{uid}\t{uid}\t{uid}\nFDSize:\t64\n'
+          'Groups:\t\nVmPeak:\t  291020 kB\nVmSize:\t  225484 kB\nVmLck:\t       0 kB\nVmPin:\t       0 kB\n'
+          'VmHWM:\t    9232 kB\nVmRSS:\t    {rss} kB\nRssAnon:\t    1884 kB\nRssFile:\t    1820 kB\n'
+          'RssShmem:\t       3384 kB\nVmData:\t   18764 kB\nVmStk:\t     132 kB\nVmExe:\t    1336 kB\n'
+          'VmLib:\t   10008 kB\nVmPTE:\t     204 kB\nVmSwap:\t       0 kB\nHugetlbPages:\t       0 kB\n'
+          'CoreDumping:\t0\nThreads:\t1\nSigQ:\t0/30136\nSigPnd:\t0000000000000000\nShdPnd:\t0000000000000000\n'
+          'SigBlk:\t0000000000000000\nSigIgn:\t0000000000001000\nSigCgt:\t00000001800004ec\n'
+          'CapInh:\t0000000000000000\nCapPrm:\t0000000000000000\nCapEff:\t0000000000000000\n'
+          'CapBnd:\t0000003fffffffff\nCapAmb:\t0000000000000000\nNoNewPrivs:\t0\nSeccomp:\t0\n'
+          'Cpus_allowed:\tf\nCpus_allowed_list:\t0-3\nMems_allowed:\t00000001\nMems_allowed_list:\t0\n'
+          'voluntary_ctxt_switches:\t42\nnonvoluntary_ctxt_switches:\t7\n')
+
+STATM = '{vsize_pages} {rss_pages} {shared_pages} 334 0 4724 0\n'
+
+SYSTEM_STAT = ('{cpus}intr 0\nctxt 81919519\nbtime 1700000000\nprocesses {forks}\nprocs_running {running}\n'
+               'procs_blocked 0\nsoftirq 0 0 0 0 0 0 0 0 0 0 0\n')
+
+CPU_STAT = '{name} {user} {nice} {system} {idle} {iowait} 0 {softirq} 0 0 0\n'
+
+MEMINFO = ('MemTotal:       {total} kB\nMemFree:        {free} kB\nMemAvailable:   {available} kB\n'
+           'Buffers:          {buffers} kB\nCached:          {cached} kB\nSwapCached:            0 kB\n'
+           'Active:          {cached} kB\nInactive:        {buffers} kB\nSwapTotal:       {swap} kB\n'
+           'SwapFree:        {swap_free} kB\nShmem:            {shmem} kB\nSReclaimable:     {reclaimable} kB\n')
+
+# PF_KTHREAD flag of stat
+KTHREAD_FLAGS = 0x00208040
+USER_FLAGS = 4194560
+
+# command lines of a typical server, most processes are workers sharing a few of them
+COMMANDS = [('nginx', 'nginx: worker process', 33), ('python3', '/usr/bin/python3 -m gunicorn app:app', 1000),
+            ('postgres', 'postgres: checkpointer', 113), ('bash', '-bash', 1000), ('sshd', 'sshd: admin@pts/0', 0),
+            ('java', '/usr/bin/java -Xmx4g -jar /opt/service/service.jar --port 8080', 1001),
+            ('systemd', '/lib/systemd/systemd --user', 1000), ('cron', '/usr/sbin/cron -f', 0)]
+KERNEL_THREADS = ['kworker/0:1', 'ksoftirqd/0', 'migration/0', 'rcu_sched', 'kswapd0', 'jbd2/sda1-8']
+
+
+def write_process(root, pid, comm='worker', cmdline='/usr/bin/worker --serve', uid=1000, utime=0, stime=0,
+                  starttime=100, rss=4096, state='S', ppid=1, threads=1, nice=0, kthread=False):
+    """Writes stat, status, statm and cmdline files of a single process into root/pid/."""
+    folder = os.path.join(root, str(pid))
+    os.makedirs(folder, exist_ok=True)
+    vsize = 0 if kthread else 230895616
+    values = dict(pid=pid, comm=comm, uid=uid, utime=utime, stime=stime, starttime=starttime, rss=rss,
+                  rss_pages=rss // 4, state=state, ppid=ppid, threads=threads, nice=nice, priority=20 + nice,
+                  flags=KTHREAD_FLAGS if kthread else USER_FLAGS, vsize=vsize, vsize_pages=vsize // 4096,
+                  shared_pages=0 if kthread else 1301)
+
+    with open(os.path.join(folder, 'stat'), 'w') as file:
+        file.write(STAT.format(**values))
+    with open(os.path.join(folder, 'status'), 'w') as file:
+        file.write(STATUS.format(**values))
+    with open(os.path.join(folder, 'statm'), 'w') as file:
+        file.write(STATM.format(**values))
+    with open(os.path.join(folder, 'cmdline'), 'w') as file:
+        # kernel threads have no command line
+        file.write(cmdline.replace(' ', '\x00') + '\x00' if cmdline else '')
+
+
+def build_proc_tree(root, count, first_pid=1):
+    """Writes count processes with consecutive PIDs into root and returns list of their PIDs."""
+    pids = list(range(first_pid, first_pid + count))
+    for pid in pids:
+        write_process(root, pid, comm=f'worker{pid % 16}', utime=pid % 1000, stime=pid % 100, starttime=pid)
+    return pids
+
+
+def write_system_files(root, processes, running=1, cpus=4, uptime=86400.0, total_memory=16 * 1024 * 1024):
+    """Writes stat, meminfo, loadavg and uptime files of a host with the given number of processes into root."""
+    # jiffies of every CPU grow with uptime, CPUs are 15-20% busy
+    lines = []
+    for cpu in range(cpus):
+        jiffies = int(uptime * 100)
+        user = jiffies * (10 + cpu) // 100
+        system = jiffies * 5 // 100
+        iowait = jiffies // 100
+        lines.append((f'cpu{cpu}', user, system, jiffies - user - system - iowait, iowait))
+    total = [sum(values) for values in zip(*(line[1:] for line in lines))]
+    lines.insert(0, ('cpu', *total))
+    cpu_lines = ''.join(CPU_STAT.format(name=name, user=user, nice=0, system=system, idle=idle, iowait=iowait,
+                                        softirq=0) for name, user, system, idle, iowait in lines)
+
+    with open(os.path.join(root, 'stat'), 'w') as file:
+        file.write(SYSTEM_STAT.format(cpus=cpu_lines, forks=processes * 3, running=running))
+    with open(os.path.join(root, 'meminfo'), 'w') as file:
+        file.write(MEMINFO.format(total=total_memory, free=total_memory // 4, available=total_memory // 2,
+                                  buffers=total_memory // 64, cached=total_memory // 8, swap=total_memory // 8,
+                                  swap_free=total_memory // 10, shmem=total_memory // 128,
+                                  reclaimable=total_memory // 32))
+    with open(os.path.join(root, 'loadavg'), 'w') as file:
+        file.write(f'{cpus * 0.38:.2f} {cpus * 0.31:.2f} {cpus * 0.27:.2f} {running}/{processes} {processes}\n')
+    with open(os.path.join(root, 'uptime'), 'w') as file:
+        file.write(f'{uptime:.2f} {uptime * cpus * 0.8:.2f}\n')
+
+
+def random_process(rng, pid):
+    """Returns write_process() keyword arguments of a random process, every tenth PID is a kernel thread."""
+    if pid % 10 == 2:
+        return dict(comm=KERNEL_THREADS[pid % len(KERNEL_THREADS)], cmdline='', uid=0, utime=rng.randrange(100),
+                    stime=rng.randrange(1000), starttime=pid, rss=0, ppid=2, kthread=True)
+
+    comm, cmdline, uid = COMMANDS[rng.randrange(len(COMMANDS))]
+    state = 'R' if rng.random() < 0.02 else rng.choice('SSSSSSSSID')
+    return dict(comm=comm[:15], cmdline=cmdline, uid=uid, utime=rng.randrange(100000), stime=rng.randrange(20000),
+                starttime=100 + pid * 3, rss=rng.randrange(1024, 2 * 1024 * 1024, 4), state=state,
+                ppid=max(1, pid // 50), threads=rng.choice((1, 1, 1, 2, 4, 16, 64)),
+                nice=rng.choice((0, 0, 0, 0, 5, 10, 19, -5)))
+
+
+def build_procfs(root, count, seed=0):
+    """Writes a host with count varied processes (and kernel threads) into root, returns list of their PIDs.
+
+    Unlike build_proc_tree() processes differ in owner, state, command line, threads, memory and CPU time, and every
+    tenth one is a kernel thread, as on a busy server.
+    """
+    rng = random.Random(seed)
+    pids = list(range(1, count + 1))
+    running = 0
+    for pid in pids:
+        process = random_process(rng, pid)
+        running += process.get('state') == 'R'
+        write_process(root, pid, **process)
+
+    write_system_files(root, count, running=max(running, 1))
+    return pids
+
+
+class ProcfsSimulator:
+    """Evolves a /proc tree written by build_procfs() over ticks, as a busy host would.
+
+    Every tick forks short-lived shell processes (living 1 to 3 ticks), lets some long-lived processes exit and
+    be replaced, advances CPU time and changes resident memory of busy processes. PIDs are allocated like the kernel
+    does: the next free PID after the last one, wrapping around at pid_max, so PIDs of exited processes are reused.
+    Only files of changed processes are rewritten.
+    """
+
+    def __init__(self, root, count, pid_max=32768, seed=0, hz=100):
+        self.root = root
+        self.pid_max = pid_max
+        self.hz = hz
+        self.uptime = 86400.0
+        self.forked = 0
+        self.exited = 0
+        self._rng = random.Random(seed)
+        self._processes = {}
+        self._deaths = {}
+        self._last_pid = count
+
+        build_procfs(root, count, seed)
+        rng = random.Random(seed)
+        for pid in range(1, count + 1):
+            self._processes[pid] = random_process(rng, pid)
+
+    @property
+    def pids(self):
+        return list(self._processes)
+
+    def tick(self, seconds=1.0, forks=500, exits=5, busy=0.05):
+        """Advances the host by seconds: forks shells, ends processes and updates CPU time and memory."""
+        rng = self._rng
+        self.uptime += seconds
+        now = int(self.uptime * self.hz)
+
+        for pid in [pid for pid, death in self._deaths.items() if death <= now]:
+            self._exit(pid)
+        long_lived = [pid for pid, process in self._processes.items()
+                      if pid not in self._deaths and not process.get('kthread')]
+        for pid in rng.sample(long_lived, min(exits, len(long_lived))):
+            # a service restarts: the old process exits and a new one is started
+            self._exit(pid)
+            self._spawn(random_process(rng, pid) | dict(starttime=now))
+
+        for _ in range(forks):
+            pid = self._spawn(dict(comm='sh', cmdline=f'sh -c run-parts /etc/cron.d/job{rng.randrange(64)}',
+                                   uid=1000, utime=0, stime=0, starttime=now, rss=rng.randrange(1024, 4096, 4),
+                                   state='R', ppid=1))
+            self._deaths[pid] = now + rng.randint(1, 3) * int(seconds * self.hz)
+
+        running = 0
+        for pid in rng.sample(list(self._processes), int(len(self._processes) * busy)):
+            process = self._processes[pid]
+            process['utime'] += rng.randrange(int(seconds * self.hz) * process.get('threads', 1) + 1)
+            process['stime'] += rng.randrange(int(seconds * self.hz) // 4 + 1)
+            if not process.get('kthread'):
+                process['rss'] = max(1024, process['rss'] + rng.randrange(-256, 257, 4))
+                process['state'] = rng.choice('RRSD')
+            running += process.get('state') == 'R'
+            write_process(self.root, pid, **process)
+
+        write_system_files(self.root, len(self._processes), running=max(running, 1), uptime=self.uptime)
+
+    def _spawn(self, process):
+        pid = self._last_pid
+        # one pass over the whole PID range at most, fork() fails with EAGAIN as well then
+        for _ in range(self.pid_max):
+            pid = pid + 1 if pid < self.pid_max else 300
+            if pid not in self._processes:
+                break
+        else:
+            raise RuntimeError(f'no free PID left below pid_max {self.pid_max}')
+        self._last_pid = pid
+        self._processes[pid] = process
+        write_process(self.root, pid, **process)
+        self.forked += 1
+        return pid
+
+    def _exit(self, pid):
+        del self._processes[pid]
+        self._deaths.pop(pid, None)
+        shutil.rmtree(os.path.join(self.root, str(pid)), ignore_errors=True)
+        self.exited += 1
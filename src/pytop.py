@@ -9,9 +9,35 @@ __version__ = '1.0.0'
 
 import urwid
 import argparse
+import asyncio
+import os
+import shutil
 import sys
+import threading
+import time
 
-from sysinfo import Cpu, MemInfo, Uptime, LoadAverage, ProcessesController, Utility
+from sysinfo import Cpu, MemInfo, Uptime, LoadAverage, Process, ProcessesController, ColumnarProcessesController, \
+    SnapshotCollector, StageTimer, Utility
+
+
+def column_names(value):
+    """ Returns list of column names parsed from comma separated list of Process.columns names."""
+    names = value.split(',')
+    for name in names:
+        if name not in Process.columns:
+            raise argparse.ArgumentTypeError(f'unknown column {name}, choose from {", ".join(Process.columns)}')
+    return names
+
+
+def positive_seconds(value):
+    """ Returns positive number of seconds parsed from CLI argument."""
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = 0
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError(f'invalid value {value}, expected positive number of seconds')
+    return seconds
 
 
 def parse_args():
@@ -19,24 +45,202 @@ def parse_args():
     argparser = argparse.ArgumentParser(prog='pytop')
     argparser.add_argument('-v', '--version', action='version',
                            version='%(prog)s ' + __version__ + ' - ' + __copyright__)
+    argparser.add_argument('-d', '--delay', type=positive_seconds, default=1.0, metavar='SECONDS',
+                           help='seconds between refreshes, fractions like 0.25 are allowed')
+    argparser.add_argument('--persistent-fds', action='store_true',
+                           help='keep /proc/[pid] files open between refreshes')
+    argparser.add_argument('--scan-threads', type=int, default=0, metavar='N',
+                           help='scan processes with N threads')
+    argparser.add_argument('--scan-processes', type=int, default=0, metavar='N',
+                           help='parse /proc files in N worker processes')
+    argparser.add_argument('--proc-events', action='store_true',
+                           help='track processes by kernel proc connector events (requires CAP_NET_ADMIN)')
+    argparser.add_argument('--adaptive-sampling', action='store_true',
+                           help='refresh idle processes less often')
+    argparser.add_argument('--two-phase', action='store_true',
+                           help='read command line and memory files only of processes on screen')
+    argparser.add_argument('--asyncio', action='store_true',
+                           help='run on asyncio event loop')
+    argparser.add_argument('--scan-budget', type=positive_seconds, default=None, metavar='SECONDS',
+                           help='scan processes for at most SECONDS per refresh, resuming on the next one')
+    argparser.add_argument('--columnar', action='store_true',
+                           help='keep processes in column arrays (uses NumPy if installed)')
+    argparser.add_argument('--columns', type=column_names, default=list(Process.default_columns), metavar='LIST',
+                           help='comma separated columns of process table, only their files are read')
+    argparser.add_argument('--stage-timing', action='store_true',
+                           help='time stages of refreshes, press i to show them')
+    argparser.add_argument('--stage-timing-file', metavar='FILE',
+                           help='write stage timing as JSON into FILE on exit (implies --stage-timing)')
 
     return argparser.parse_args()
 
 
+class DoubleBuffer:
+    """Two slots for snapshots: the writer fills the back slot and then flips it to the front.
+
+    There is a single writer thread and snapshots are immutable, so flipping the index is enough for readers to
+    always get a complete snapshot.
+    """
+
+    def __init__(self):
+        self._slots = [None, None]
+        self._front = 0
+
+    def publish(self, snapshot):
+        back = 1 - self._front
+        self._slots[back] = snapshot
+        self._front = back
+
+    def read(self):
+        return self._slots[self._front]
+
+
+class Collector(threading.Thread):
+    """Background thread which takes snapshots of data sources and publishes them.
+
+        The UI is woken up by a write into a pipe watched by urwid.MainLoop (see attach()), so rendering and input
+        handling never wait for /proc I/O.
+
+        Args:
+            source (:obj:'SnapshotCollector'): Producer of snapshots.
+            interval (float): Seconds between two updates.
+    """
+
+    def __init__(self, source, interval=1.0):
+        threading.Thread.__init__(self, name='pytop-collector', daemon=True)
+        self.source = source
+        self.interval = interval
+        self.error = None
+        self.buffer = DoubleBuffer()
+        self.buffer.publish(source.snapshot)
+        self._main_loop = None
+        self._notify_fd = None
+        self._stopped = threading.Event()
+
+    def attach(self, main_loop, callback):
+        """Calls callback on the main_loop thread whenever a new snapshot is published."""
+        self._main_loop = main_loop
+        self._notify_fd = main_loop.watch_pipe(callback)
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.buffer.publish(self.source.update())
+            except Exception as ex:
+                # re-raised by the UI thread
+                self.error = ex
+                self._stopped.set()
+            os.write(self._notify_fd, b'.')
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self._main_loop.remove_watch_pipe(self._notify_fd)
+
+
+class AsyncCollector:
+    """Asyncio task which takes snapshots of data sources with SnapshotCollector.aupdate() and publishes them.
+
+        Counterpart of Collector for urwid.AsyncioEventLoop: /proc files are read in the executor of the asyncio
+        loop, so the loop is never blocked by I/O.
+
+        Args:
+            source (:obj:'SnapshotCollector'): Producer of snapshots.
+            loop (:obj:'asyncio.AbstractEventLoop'): Event loop running the UI.
+            interval (float): Seconds between two updates.
+    """
+
+    def __init__(self, source, loop, interval=1.0):
+        self.source = source
+        self.interval = interval
+        self.error = None
+        self.buffer = DoubleBuffer()
+        self.buffer.publish(source.snapshot)
+        self._loop = loop
+        self._main_loop = None
+        self._callback = None
+        self._task = None
+
+    def attach(self, main_loop, callback):
+        """Calls callback on the event loop whenever a new snapshot is published."""
+        self._main_loop = main_loop
+        self._callback = callback
+
+    def start(self):
+        self._task = self._loop.create_task(self.run())
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.buffer.publish(await self.source.aupdate())
+            except Exception as ex:
+                self.error = ex
+                self._notify()
+                return
+            self._notify()
+
+    def _notify(self):
+        # an alarm of urwid.AsyncioEventLoop enters idle afterwards, which redraws the screen; exceptions raised by
+        # callback are propagated by the event loop
+        self._main_loop.event_loop.alarm(0, lambda: self._callback(None))
+
+    def stop(self):
+        self._task.cancel()
+
+
+class TimedMainLoop(urwid.MainLoop):
+    """urwid.MainLoop which records durations of screen redraws as 'draw' stage of stage_timer (if it is set)."""
+
+    def __init__(self, *args, stage_timer=None, **kwargs):
+        self.stage_timer = stage_timer
+        urwid.MainLoop.__init__(self, *args, **kwargs)
+
+    def draw_screen(self):
+        if self.stage_timer is None:
+            return urwid.MainLoop.draw_screen(self)
+        start = time.perf_counter_ns()
+        urwid.MainLoop.draw_screen(self)
+        self.stage_timer.record('draw', time.perf_counter_ns() - start)
+
+
+class StageTimingPanel(urwid.WidgetWrap):
+    """Box with p50/p99 of durations of stages and of counters per refresh
+
+        Args:
+            stage_timer (:obj:'StageTimer'): Source of the statistics.
+    """
+
+    def __init__(self, stage_timer):
+        self.stage_timer = stage_timer
+        self.text = urwid.Text('')
+        self.refresh()
+        urwid.WidgetWrap.__init__(self, urwid.LineBox(self.text, title='Stage timing'))
+
+    def refresh(self):
+        """Update content of widget with actual statistics."""
+        markup = [('table_header', '%-14s%9s%9s' % ('Stage', 'p50', 'p99'))]
+        for name, stats in self.stage_timer.summary().items():
+            if stats['unit'] == 'ns':
+                values = '%7.2fms%7.2fms' % (stats['p50'] / 1e6, stats['p99'] / 1e6)
+            else:
+                values = '%9d%9d' % (stats['p50'], stats['p99'])
+            markup.append(('fields_names', '\n%-14.14s' % name))
+            markup.append(('normal', values))
+        self.text.set_text(markup)
+
+
 class CpuAndMemoryPanel(urwid.WidgetWrap):
     """A pile of widgets (CPU usage, memory and swap usage) stacked vertically from top to bottom
 
         Args:
-            cpu (:obj:'Cpu'): Object that return list of % usage for each CPU.
-            memory (:obj:'MemInfo'): Object that return lmemory usage.
+            snapshot (:obj:'SnapshotCollector.Snapshot'): Data to display, the number of CPUs is taken from it.
     """
 
-    def __init__(self, cpu, memory):
-        self.cpu = cpu
-        self.memory = memory
+    def __init__(self, snapshot):
         self.widgets = []
 
-        for i, value in enumerate(self.cpu.cpu_usage):
+        for i, value in enumerate(snapshot.cpu_usage):
             self.widgets.append(urwid.Text(self.cpu_markup(i + 1, 0.0)))
         self.widgets.append(urwid.Text(self.memory_markup('Mem', 0, 0)))
         self.widgets.append(urwid.Text(self.memory_markup('Swp', 0, 0)))
@@ -44,13 +248,13 @@ class CpuAndMemoryPanel(urwid.WidgetWrap):
         panel = urwid.Pile(self.widgets)
         urwid.WidgetWrap.__init__(self, panel)
 
-    def refresh(self):
+    def refresh(self, snapshot):
         """Update content of widget with actual data."""
-        for i, value in enumerate(self.cpu.cpu_usage):
+        for i, value in enumerate(snapshot.cpu_usage):
             self.widgets[i].set_text(self.cpu_markup(i + 1, value))
 
-        self.widgets[-2].set_text(self.memory_markup('Mem', self.memory.used_memory, self.memory.total_memory))
-        self.widgets[-1].set_text(self.memory_markup('Swp', self.memory.used_swap, self.memory.total_swap))
+        self.widgets[-2].set_text(self.memory_markup('Mem', snapshot.used_memory, snapshot.total_memory))
+        self.widgets[-1].set_text(self.memory_markup('Swp', snapshot.used_swap, snapshot.total_swap))
 
     def cpu_markup(self, index, percent, width=29):
         """Returns text markup for Text widget with CPU info"""
@@ -96,15 +300,14 @@ class CpuAndMemoryPanel(urwid.WidgetWrap):
             result = '%4.4s%c' % (value/1024, 'M')
         elif value < 1024*1024*1024:
             result = '%4.4s%c' % (value/(1024*1024), 'G')
+        else:
+            result = '%4.4s%c' % (value/(1024*1024*1024), 'T')
         return result
 
 
 class RightPanel(urwid.WidgetWrap):
     """docstring for RightPanel"""
-    def __init__(self, controller, uptime, load):
-        self.controller = controller
-        self.uptime = uptime
-        self.load = load
+    def __init__(self):
         self.widgets = []
 
         self.widgets.append(urwid.Text([('fields_names', u' Tasks:'), ' 0, 0 thr, 0 kthr; 0 running']))
@@ -114,50 +317,132 @@ class RightPanel(urwid.WidgetWrap):
         self.panel = urwid.Pile(self.widgets)
         urwid.WidgetWrap.__init__(self, self.panel)
 
-    def refresh(self):
-        self.widgets[0].set_text([('fields_names', u' Tasks:'), f' {self.controller.proccesses_number}, 0 thr, 0 kthr; {self.controller.running_proccesses_number} running'])
-        self.widgets[1].set_text([('fields_names', u' Load average:'), self.load.load_average_as_string])
-        self.widgets[2].set_text([('fields_names', u' Uptime:'), self.uptime.uptime_as_string])
+    def refresh(self, snapshot):
+        # like htop, kernel threads are not counted as tasks
+        tasks = snapshot.processes_number - snapshot.kernel_threads_number
+        self.widgets[0].set_text([('fields_names', u' Tasks:'), f' {tasks}, {snapshot.threads_number} thr, '
+                                  f'{snapshot.kernel_threads_number} kthr; {snapshot.running_tasks} running'])
+        self.widgets[1].set_text([('fields_names', u' Load average:'), ' ' + snapshot.load_average])
+        self.widgets[2].set_text([('fields_names', u' Uptime:'), ' ' + snapshot.uptime])
+
+
+class ProcessListWalker(urwid.ListWalker):
+    """Rows of processes of a snapshot, Text widgets are made only for the rows urwid asks for (the ones on screen)
+
+        Args:
+            markup (callable): Returns text markup of a row of process.
+    """
+
+    def __init__(self, markup):
+        self.markup = markup
+        self.processes = ()
+        self.focus = 0
+        self._widgets = {}
+
+    def set_processes(self, processes):
+        """Replaces rows, the focus stays at the same position."""
+        self.processes = processes
+        self._widgets = {}
+        self.focus = max(min(self.focus, len(processes) - 1), 0)
+        self._modified()
+
+    def __len__(self):
+        return len(self.processes)
+
+    def __getitem__(self, position):
+        widget = self._widgets.get(position)
+        if widget is None:
+            if not 0 <= position < len(self.processes):
+                raise IndexError(position)
+            widget = self._widgets[position] = urwid.Text(self.markup(self.processes[position]))
+        return widget
+
+    def next_position(self, position):
+        if position + 1 >= len(self.processes):
+            raise IndexError(position)
+        return position + 1
+
+    def prev_position(self, position):
+        if position <= 0:
+            raise IndexError(position)
+        return position - 1
+
+    def positions(self, reverse=False):
+        if reverse:
+            return range(len(self.processes) - 1, -1, -1)
+        return range(len(self.processes))
+
+    def set_focus(self, position):
+        self.focus = position
+        self._modified()
 
 
 class ProcessPanel(urwid.WidgetWrap):
-    """docstring for ProcessPanel"""
-    def __init__(self, controller):
-        self.controller = controller
-        self.header = urwid.Text(('table_header',u'  PID USER       PRI    NI VIRT   RES  SHR S  CPU%  MEM%      TIME+   Command'))
+    """Table of processes with columns of Process.columns registry
+
+        Args:
+            snapshot (:obj:'SnapshotCollector.Snapshot'): Data to display.
+            columns (:obj:'list' of :obj:'ProcessColumn'): Columns to display.
+    """
 
-        self.processes = []
+    # width of column, negative for left aligned columns
+    widths = {'PID': 5, 'USER': -9, 'PRIORITY': 3, 'NICE': 3, 'M_VIRT': 5, 'M_RESIDENT': 5, 'M_SHARE': 5,
+              'STATE': 1, 'PERCENT_CPU': 5, 'PERCENT_MEM': 5, 'TIME': 9, 'COMM': -20, 'IO_READ': 6, 'IO_WRITE': 6,
+              'M_PSS': 5, 'SAMPLE_AGE': 5}
+    memory_columns = ('M_VIRT', 'M_RESIDENT', 'M_SHARE', 'M_PSS')
+    bytes_columns = ('IO_READ', 'IO_WRITE')
 
-        for pr in self.controller.processes:
-            self.processes.append(urwid.Text(self.process_markup(pr)))
+    def __init__(self, snapshot, columns):
+        self.columns = columns
+        self.header = urwid.Text(('table_header', ' '.join(self.align(column, column.header) for column in columns)))
 
-        self.table_view = urwid.ListBox(urwid.SimpleFocusListWalker(self.processes))
+        # rows are rendered lazily, only the ones on screen cost markup and widgets
+        self.processes = ProcessListWalker(self.process_markup)
+        self.processes.set_processes(snapshot.processes)
+
+        self.table_view = urwid.ListBox(self.processes)
         self.table_widget = urwid.Frame(self.table_view, header=self.header)
 
         urwid.WidgetWrap.__init__(self, self.table_widget)
 
-    def refresh(self):
-        self.processes = []
+    def refresh(self, snapshot):
+        self.processes.set_processes(snapshot.processes)
 
-        for pr in self.controller.processes:
-            self.processes.append(urwid.Text(self.process_markup(pr)))
+    def visible_pids(self, rows):
+        """Returns PIDs of rows which may be on screen (screen height of rows around the focused one)."""
+        focus = self.processes.focus
+        return [pr.pid for pr in self.processes.processes[max(focus - rows, 0):focus + rows + 1]]
 
     def process_markup(self, pr):
-        priority = 'RT' if pr.priority == '-100' else pr.priority
-
         result = []
-        result.append(('progress_bracket', u'%5.5s %-10.10s %4.4s' % (pr.pid, pr.user, priority)))
-
-        if int(pr.niceness) < 0:
-            result.append(('niceness', u' %4.4s' % pr.niceness))
-        else:
-            result.append(('progress_bracket', u' %4.4s' % pr.niceness))
+        for column in self.columns:
+            style, text = self.cell_markup(column, getattr(pr, column.attribute))
+            result.append((style, (' ' if result else '') + self.align(column, text)))
+        return result
 
-        result.append(('progress_bracket', u' %4.4sM %4.4s %4.4s %1.1s  %4.1f  %4.1f %8.18s %s'
-         % (pr.virtual_memory, pr.resident_memory, pr.shared_memory,
-            pr.state, pr.cpu_usage, pr.memory_usage, pr.time, pr.command[:20])))
+    def cell_markup(self, column, value):
+        """Returns (style, text) of a cell."""
+        if value is None:
+            # not permitted to read, or not collected by the controller
+            return 'progress_bracket', '-'
+        if column.name == 'PRIORITY' and value == '-100':
+            return 'progress_bracket', 'RT'
+        if column.name == 'NICE' and int(value) < 0:
+            return 'niceness', value
+        if column.name in ProcessPanel.memory_columns:
+            return 'progress_bracket', CpuAndMemoryPanel.format_memory(value)
+        if column.name in ProcessPanel.bytes_columns:
+            return 'progress_bracket', CpuAndMemoryPanel.format_memory(value // 1024)
+        if isinstance(value, float):
+            return 'progress_bracket', '%.1f' % value
+        return 'progress_bracket', str(value)
 
-        return result
+    @staticmethod
+    def align(column, text):
+        width = ProcessPanel.widths.get(column.name, 8)
+        if width < 0:
+            return text[:-width].ljust(-width)
+        return text[:width].rjust(width)
 
 
 class Application:
@@ -172,14 +457,48 @@ class Application:
         ('niceness', 'dark red', ''),
     ]
 
-    def __init__(self):
+    def __init__(self, options):
+        names = list(options.columns)
+        if options.scan_budget is not None and not options.columnar and 'SAMPLE_AGE' not in names:
+            # rows left out by time-budgeted scans are marked by the age of their sample
+            names.append('SAMPLE_AGE')
+        # only files of the displayed columns are read
+        self.columns = [Process.columns[name] for name in names]
+        Process.set_columns(names)
+        self.stage_timer = StageTimer() if options.stage_timing or options.stage_timing_file else None
+        self.stage_timing_file = options.stage_timing_file
+
         # initialize data sources
         self.cpu = Cpu()
         self.memory = MemInfo()
         self.uptime = Uptime()
         self.load = LoadAverage()
-        self.processes = ProcessesController(self.uptime, self.memory.total_memory)
-        self.refreshable_data = [self.cpu, self.memory, self.uptime, self.load, self.processes]
+        if options.columnar:
+            self.processes = ColumnarProcessesController(self.uptime, self.memory.total_memory, use_numpy=True)
+        else:
+            self.processes = ProcessesController(self.uptime, self.memory.total_memory,
+                                                 persistent_files=options.persistent_fds,
+                                                 scan_threads=options.scan_threads,
+                                                 scan_processes=options.scan_processes,
+                                                 proc_events=options.proc_events,
+                                                 adaptive_sampling=options.adaptive_sampling,
+                                                 detail_rows=self.detail_rows(options),
+                                                 stage_timer=self.stage_timer)
+            if options.two_phase:
+                # the rows read in detail are the first ones on screen
+                self.processes.set_sort_key('cpu_usage', reverse=True)
+        # panels render only snapshots taken by this single producer
+        time_budget = options.scan_budget if not options.columnar else None
+        source = SnapshotCollector(self.cpu, self.memory, self.uptime, self.load, self.processes, time_budget)
+        if options.asyncio:
+            self.asyncio_loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.asyncio_loop)
+            event_loop = urwid.AsyncioEventLoop(loop=self.asyncio_loop)
+            self.collector = AsyncCollector(source, self.asyncio_loop, interval=options.delay)
+        else:
+            event_loop = None
+            self.collector = Collector(source, interval=options.delay)
+        snapshot = self.collector.buffer.read()
 
         # initialize buttons
         f1 = urwid.Button([('normal', u'F1'), ('foot', u'Help')])
@@ -196,31 +515,64 @@ class Application:
         urwid.connect_signal(f10, 'click', self.handle_f10_buton)
 
         # initialize widgets
-        self.left_panel = CpuAndMemoryPanel(self.cpu, self.memory)
-        self.right_panel = RightPanel(self.processes, self.uptime, self.load)
+        self.left_panel = CpuAndMemoryPanel(snapshot)
+        self.right_panel = RightPanel()
         self.header = urwid.Columns([self.left_panel, self.right_panel])
         self.buttons = urwid.Columns([f1, f3, f4, f6, f7, f8, f10])
-        self.processes_list = ProcessPanel(self.processes)
+        self.processes_list = ProcessPanel(snapshot, self.columns)
         self.main_widget = urwid.Frame(self.processes_list, header=self.header, footer=self.buttons)
+        self.timing_widget = None
+        if self.stage_timer is not None:
+            self.timing_panel = StageTimingPanel(self.stage_timer)
+            self.timing_widget = urwid.Overlay(self.timing_panel, self.main_widget, align='right', width=36,
+                                               valign='top', height='pack')
+
+        self.loop = TimedMainLoop(self.main_widget,
+                                  self.palette,
+                                  unhandled_input=self.handle_input,
+                                  event_loop=event_loop,
+                                  stage_timer=self.stage_timer
+                                  )
+
+        self.collector.attach(self.loop, self.refresh)
+
+    def refresh(self, data):
+        """Renders the latest snapshot published by the collector."""
+        if self.collector.error is not None:
+            raise self.collector.error
+
+        snapshot = self.collector.buffer.read()
+        start = time.perf_counter_ns()
+        self.left_panel.refresh(snapshot)
+        self.right_panel.refresh(snapshot)
+        self.processes_list.refresh(snapshot)
+        if self.stage_timer is not None:
+            # widgets are rendered later, by the draw stage
+            self.stage_timer.record('markup', time.perf_counter_ns() - start)
+            if self.loop.widget is self.timing_widget:
+                self.timing_panel.refresh()
+
+        _, rows = self.loop.screen.get_cols_rows()
+        self.processes.set_pinned_pids(self.processes_list.visible_pids(rows))
+        return True
 
-        self.loop = urwid.MainLoop(self.main_widget,
-                                    self.palette,
-                                    unhandled_input=self.handle_input
-                                    )
-
-        self.loop.set_alarm_in(1, self.refresh)
-
-    def refresh(self, loop, data):
-        for i in self.refreshable_data:
-            i.update()
-
-        self.loop.set_alarm_in(1, self.refresh)
-        self.left_panel.refresh()
-        self.right_panel.refresh()
-        # TODO(AOS) Update self.processes_list
+    @staticmethod
+    def detail_rows(options):
+        """Returns number of processes read in detail: all of them, or as many as the terminal has rows."""
+        if not options.two_phase:
+            return 0
+        # rows scrolled to later are pinned as visible ones
+        return shutil.get_terminal_size().lines
 
     def start(self):
-        self.loop.run()
+        self.collector.start()
+        try:
+            self.loop.run()
+        finally:
+            self.collector.stop()
+            self.processes.close()
+            if self.stage_timing_file is not None:
+                self.stage_timer.dump(self.stage_timing_file)
 
     def handle_f1_buton(self, key):
         self.display_help()
@@ -258,11 +610,20 @@ class Application:
                 raise urwid.ExitMainLoop()
             if key == 'f1':
                 self.display_help()
+            elif key == 'i' and self.timing_widget is not None:
+                self.toggle_stage_timing()
             else:
                 self.loop.widget = self.main_widget
         elif type(key) == tuple:
             pass
 
+    def toggle_stage_timing(self):
+        if self.loop.widget is self.timing_widget:
+            self.loop.widget = self.main_widget
+        else:
+            self.timing_panel.refresh()
+            self.loop.widget = self.timing_widget
+
     def display_help(self):
         help_txt = \
             f"""
@@ -271,11 +632,30 @@ class Application:
 
         Pytop is the htop copycat implemented in Python.
 
-        usage: pytop [-h] [-v]
+        usage: pytop [-h] [-v] [-d SECONDS] [--persistent-fds] [--scan-threads N] [--scan-processes N]
+                     [--proc-events] [--adaptive-sampling] [--two-phase] [--asyncio] [--scan-budget SECONDS]
+                     [--columnar] [--columns LIST] [--stage-timing] [--stage-timing-file FILE]
 
         optional arguments:
-            -h, --help     show this help message and exit
-            -v, --version  show program's version number and exit
+            -h, --help          show this help message and exit
+            -v, --version       show program's version number and exit
+            -d, --delay SECONDS seconds between refreshes, fractions like 0.25 are allowed
+            --persistent-fds    keep /proc/[pid] files open between refreshes
+            --scan-threads N    scan processes with N threads
+            --scan-processes N  parse /proc files in N worker processes
+            --proc-events       track processes by kernel proc connector events (requires CAP_NET_ADMIN)
+            --adaptive-sampling refresh idle processes less often
+            --two-phase         read command line and memory files only of processes on screen
+            --asyncio           run on asyncio event loop
+            --scan-budget SECONDS
+                                scan processes for at most SECONDS per refresh, resuming on the next one
+            --columnar          keep processes in column arrays (uses NumPy if installed)
+            --columns LIST      comma separated columns of process table, only their files are read
+                                (PID, USER, PRIORITY, NICE, M_VIRT, M_RESIDENT, M_SHARE, STATE, PERCENT_CPU,
+                                PERCENT_MEM, TIME, COMM, IO_READ, IO_WRITE, M_PSS, SAMPLE_AGE)
+            --stage-timing      time stages of refreshes, press i to show them
+            --stage-timing-file FILE
+                                write stage timing as JSON into FILE on exit (implies --stage-timing)
         """
         self.help_txt = urwid.Text([('normal', help_txt),
                                     ('fields_names', u'\nPress any key to return')],
@@ -287,5 +667,5 @@ class Application:
 if __name__ == "__main__":
     options = parse_args()
 
-    Application().start()
+    Application(options).start()
     sys.exit(0)
\ No newline at end of file
@@ -7,10 +7,30 @@ __copyright__ = '(C) 2019 ' + __author__
 __license__ = "MIT"
 __version__ = '1.0.0'
 
-from collections import namedtuple
+from collections import deque, namedtuple, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import timedelta
+from multiprocessing import shared_memory
+from operator import attrgetter
+import array
+import asyncio
+import errno
+import heapq
+import itertools
+import json
 import os
 import pwd
+import resource
+import socket
+import struct
+import sys
+import threading
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class SystemInfoError(Exception):
@@ -18,7 +38,15 @@ class SystemInfoError(Exception):
     pass
 
 
-class Cpu:
+class AsyncUpdateMixin:
+    """Adds aupdate() coroutine which runs blocking update() in the default executor of the running event loop."""
+
+    async def aupdate(self):
+        """Coroutine version of update() which does not block the running event loop."""
+        await asyncio.get_running_loop().run_in_executor(None, self.update)
+
+
+class Cpu(AsyncUpdateMixin):
     """
     Calculates CPU usage based on /proc/stat file data
 
@@ -27,7 +55,9 @@ class Cpu:
 
     Attributes:
         update(): Retrieves fresh CPU statistics.
+        aupdate(): Coroutine version of update().
         cpu_usage: List of CPUs usage per CPU measured between last two update() calls.
+        running_tasks: Number of tasks in runnable state at the last update() call.
 
     .. PROC(5)
         http://man7.org/linux/man-pages/man5/proc.5.html
@@ -36,14 +66,21 @@ class Cpu:
     CpuStat = namedtuple('CpuStat', ['name', 'user', 'nice', 'system', 'idle', 'iowait',
                                      'irq', 'softirq', 'steal', 'guest', 'guest_nice'])
 
+    _proc_folder = '/proc'
+
     def __init__(self):
-        self.prev_stat = Cpu._read_file()
+        self.prev_stat, self._running_tasks = Cpu._read_file()
         self.curr_stat = self.prev_stat
 
     def update(self):
         """ Retrieves fresh CPU statistics and stores previous statistics. """
         self.prev_stat = self.curr_stat
-        self.curr_stat = Cpu._read_file()
+        self.curr_stat, self._running_tasks = Cpu._read_file()
+
+    @property
+    def running_tasks(self) -> int:
+        """:obj:`int`: Number of tasks (threads) in runnable state, procs_running of /proc/stat."""
+        return self._running_tasks
 
     @property
     def cpu_usage(self) -> list:
@@ -72,9 +109,10 @@ class Cpu:
         return cpu_usage
 
     @staticmethod
-    def _read_file() -> list:
+    def _read_file() -> tuple:
         lst = []
-        with open('/proc/stat') as file:
+        running_tasks = 0
+        with open(f'{Cpu._proc_folder}/stat') as file:
             for line in file:
                 if line.startswith('cpu '):
                     continue
@@ -83,13 +121,15 @@ class Cpu:
                     values = map(int, values)
                     temp_tuple = Cpu.CpuStat(name, *values)
                     lst.append(temp_tuple)
+                elif line.startswith('procs_running '):
+                    running_tasks = int(line.split()[1])
         if not lst:
             raise SystemInfoError('Cannot parse /proc/stat file')
 
-        return lst
+        return lst, running_tasks
 
 
-class LoadAverage:
+class LoadAverage(AsyncUpdateMixin):
     """
         The load average over 1, 5, and 15 minutes.
 
@@ -98,6 +138,7 @@ class LoadAverage:
 
         Attributes:
             update(): Retrieves actual load average value from /proc/loadavg.
+            aupdate(): Coroutine version of update().
             load_average: Returns load average over 1, 5, and 15 minutes.
             load_average_as_string: Returns load average as a formatted string 'x.xx x.xx x.xx'.
 
@@ -105,6 +146,8 @@ class LoadAverage:
             http://man7.org/linux/man-pages/man5/proc.5.html
     """
 
+    _proc_folder = '/proc'
+
     def __init__(self):
         self._load_average = LoadAverage._read_file()
 
@@ -114,7 +157,7 @@ class LoadAverage:
 
     @staticmethod
     def _read_file():
-        with open('/proc/loadavg') as file:
+        with open(f'{LoadAverage._proc_folder}/loadavg') as file:
             try:
                 t1, t5, t15, *_ = file.read().split()
                 values = map(float, [t1, t5, t15])
@@ -134,7 +177,7 @@ class LoadAverage:
         return f"{self._load_average[0]} {self._load_average[1]} {self._load_average[2]}"
 
 
-class Uptime:
+class Uptime(AsyncUpdateMixin):
     """
         The uptime of the system
 
@@ -142,6 +185,7 @@ class Uptime:
 
         Attributes:
             update(): Retrieves actual uptime value from /proc/uptime.
+            aupdate(): Coroutine version of update().
             uptime: Returns system uptime (including time spent in suspend) in seconds.
             uptime_as_string: Returns uptime as a formatted string 'dd hh:mm:ss'
 
@@ -149,6 +193,8 @@ class Uptime:
             http://man7.org/linux/man-pages/man5/proc.5.html
     """
 
+    _proc_folder = '/proc'
+
     def __init__(self):
         self._uptime = Uptime._read_file()
 
@@ -158,7 +204,7 @@ class Uptime:
 
     @staticmethod
     def _read_file():
-        with open('/proc/uptime') as file:
+        with open(f'{Uptime._proc_folder}/uptime') as file:
             try:
                 value = file.read().split()[0]
                 return int(float(value))
@@ -177,7 +223,7 @@ class Uptime:
         return f"{uptime}"
 
 
-class MemInfo:
+class MemInfo(AsyncUpdateMixin):
     """
     Information about memory usage, both physical and swap.
 
@@ -186,6 +232,7 @@ class MemInfo:
 
     Attributes:
         update(): Retrieves actual memory statistics from /proc/meminfo.
+        aupdate(): Coroutine version of update().
         total_memory(): Returns total amount of RAM space available.
         used_memory(): Returns amount of RAM space that is currently used.
         total_swap(): Returns total amount of swap space available.
@@ -194,6 +241,8 @@ class MemInfo:
     .. PROC(5)
         http://man7.org/linux/man-pages/man5/proc.5.html
     """
+    _proc_folder = '/proc'
+
     def __init__(self):
         self._total_memory = None
         self._used_memory = None
@@ -245,7 +294,7 @@ class MemInfo:
         meaningful_fields = ['MemTotal', 'MemFree', 'Buffers', 'Cached', 'SReclaimable',
                              'Shmem', 'SwapTotal', 'SwapFree']
         values = {}
-        with open('/proc/meminfo') as file:
+        with open(f'{MemInfo._proc_folder}/meminfo') as file:
             for line in file:
                 try:
                     field, value, *unit = line.split()
@@ -258,6 +307,279 @@ class MemInfo:
         return values
 
 
+class ProcFileCache:
+    """
+        Cache of open /proc/[pid]/ file descriptors.
+
+        Class keeps /proc/[pid] directory descriptors and descriptors of frequently read ("hot") files open across
+        updates and re-reads them with pread() into a reused buffer, which saves the path lookup, open() and close()
+        syscalls on every read. Other files are opened relative to the cached directory descriptor.
+        The number of open descriptors is capped; least recently used processes are closed first.
+        A process whose files report ENOENT or ESRCH has exited and is evicted from the cache, except for ESRCH of
+        files which need a memory map (kernel threads and zombies have none).
+        Opened descriptors are counted as 'files opened' by stage_timer (StageTimer) if it is set.
+
+        Attributes:
+            read(): Returns content of /proc/[pid]/[name] file.
+            evict(): Closes all descriptors of the process.
+            close(): Closes all cached descriptors.
+            open_files: Number of open descriptors.
+    """
+
+    _vanished_errors = (errno.ENOENT, errno.ESRCH)
+    # files which report ESRCH for live processes without a memory map
+    _mm_files = frozenset(('io', 'smaps_rollup'))
+
+    def __init__(self, proc_folder='/proc', hot_files=('stat',), max_files=None, stage_timer=None):
+        self._proc_folder = proc_folder
+        self._stage_timer = stage_timer
+        self._hot_files = frozenset(hot_files)
+        self._max_files = max_files if max_files is not None else ProcFileCache._default_max_files()
+        self._entries = OrderedDict()  # pid -> (directory fd, {file name: fd})
+        self._open_files = 0
+        self._buffer = bytearray(4096)
+
+    def read(self, pid, name):
+        """Returns content of /proc/[pid]/[name] file as bytes."""
+        try:
+            entry = self._entries.get(pid)
+            if entry is None:
+                entry = self._open_entry(pid)
+            else:
+                self._entries.move_to_end(pid)
+            dir_fd, files = entry
+
+            if name in self._hot_files:
+                fd = files.get(name)
+                if fd is None:
+                    fd = self._open(name, os.O_RDONLY | os.O_CLOEXEC, dir_fd=dir_fd)
+                    files[name] = fd
+                    self._open_files += 1
+                    self._shrink()
+                return self._pread(fd)
+
+            fd = self._open(name, os.O_RDONLY | os.O_CLOEXEC, dir_fd=dir_fd)
+            try:
+                return self._pread(fd)
+            finally:
+                os.close(fd)
+        except OSError as ex:
+            if ex.errno in ProcFileCache._vanished_errors and \
+                    not (ex.errno == errno.ESRCH and name in ProcFileCache._mm_files):
+                self.evict(pid)
+            raise
+
+    def evict(self, pid):
+        """Closes all descriptors of the process."""
+        entry = self._entries.pop(pid, None)
+        if entry is None:
+            return
+
+        dir_fd, files = entry
+        for fd in files.values():
+            os.close(fd)
+        os.close(dir_fd)
+        self._open_files -= len(files) + 1
+
+    def close(self):
+        """Closes all cached descriptors."""
+        for pid in list(self._entries):
+            self.evict(pid)
+
+    @property
+    def open_files(self):
+        """:obj:`int`: Number of open descriptors."""
+        return self._open_files
+
+    def _open_entry(self, pid):
+        dir_fd = self._open(f'{self._proc_folder}/{pid}', os.O_RDONLY | os.O_DIRECTORY | os.O_CLOEXEC)
+        entry = (dir_fd, {})
+        self._entries[pid] = entry
+        self._open_files += 1
+        self._shrink()
+        return entry
+
+    def _open(self, path, flags, dir_fd=None):
+        fd = os.open(path, flags, dir_fd=dir_fd)
+        if self._stage_timer is not None:
+            self._stage_timer.count('files opened')
+        return fd
+
+    def _shrink(self):
+        # the most recently used process is never evicted, so it can be read even with a tiny limit
+        while self._open_files > self._max_files and len(self._entries) > 1:
+            self.evict(next(iter(self._entries)))
+
+    def _pread(self, fd):
+        while True:
+            size = os.preadv(fd, [self._buffer], 0)
+            if size < len(self._buffer):
+                return bytes(memoryview(self._buffer)[:size])
+            self._buffer = bytearray(2 * len(self._buffer))
+
+    @staticmethod
+    def _default_max_files():
+        # leave half of the descriptors for the rest of the application
+        soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft_limit == resource.RLIM_INFINITY:
+            soft_limit = 65536
+        return max(soft_limit // 2, 16)
+
+
+class UserNames:
+    """
+        Cache of user names by UID shared by all processes.
+
+        pwd.getpwuid() may be a network round trip with NSS backends like LDAP, so every UID is resolved only once.
+        Unknown UIDs are cached as well and shown as a number. The cache is dropped when modification time of
+        /etc/passwd changes, which is checked by refresh() once per update.
+
+        Attributes:
+            name(): Returns user name of UID.
+            refresh(): Drops cached names if /etc/passwd was modified.
+            prewarm(): Resolves all users with a single pwd.getpwall() call.
+            lookups: Number of pwd.getpwuid() calls made so far.
+    """
+
+    _passwd_file = '/etc/passwd'
+
+    def __init__(self, prewarm=False):
+        self._names = {}
+        self._prewarm = prewarm
+        self._mtime = UserNames._passwd_mtime()
+        self.lookups = 0
+        if prewarm:
+            self.prewarm()
+
+    def name(self, uid):
+        """Returns user name of UID, or UID as string if there is no such user."""
+        name = self._names.get(uid)
+        if name is None:
+            self.lookups += 1
+            try:
+                name = sys.intern(pwd.getpwuid(uid).pw_name)
+            except KeyError:
+                name = str(uid)
+            self._names[uid] = name
+        return name
+
+    def refresh(self):
+        """Drops cached names if /etc/passwd was modified since the last call."""
+        mtime = UserNames._passwd_mtime()
+        if mtime != self._mtime:
+            self._mtime = mtime
+            self._names.clear()
+            if self._prewarm:
+                self.prewarm()
+
+    def prewarm(self):
+        """Resolves all users with a single pwd.getpwall() call (which enumerates the whole directory service)."""
+        for entry in pwd.getpwall():
+            self._names.setdefault(entry.pw_uid, sys.intern(entry.pw_name))
+
+    @staticmethod
+    def _passwd_mtime():
+        try:
+            return os.stat(UserNames._passwd_file).st_mtime_ns
+        except OSError:
+            return None
+
+
+class StageTimer:
+    """
+        Rolling histograms of durations of pytop's own work stages and of per-tick counters.
+
+        Durations (in perf_counter_ns() nanoseconds) are either recorded as one sample per call (record()), or added
+        up over a tick (add()), like parsing time of thousands of processes, and turned into one sample by flush().
+        Counters (count()), like the number of opened files, are added up over a tick the same way.
+        Only the last window samples of every stage are kept. Methods may be called from several threads.
+
+        Attributes:
+            record(): Adds a sample of a stage.
+            add(): Adds a duration to the current tick of a stage.
+            count(): Adds to the current tick of a counter.
+            flush(): Ends the current tick, its sums become samples.
+            percentile(): Returns a percentile of samples of a stage or counter.
+            summary(): Returns {name: statistics} of all stages and counters.
+            dump(): Writes summary() into a JSON file.
+            names: Names of stages and counters in order of the first sample.
+    """
+
+    def __init__(self, window=1000):
+        self._window = window
+        self._samples = OrderedDict()  # name -> deque of samples
+        self._pending = {}  # name -> sum over the current tick
+        self._counters = set()
+        self._lock = threading.Lock()
+
+    def record(self, stage, nanoseconds):
+        """Adds a sample of the stage."""
+        with self._lock:
+            self._append(stage, nanoseconds)
+
+    def add(self, stage, nanoseconds):
+        """Adds nanoseconds to the current tick of the stage."""
+        with self._lock:
+            self._pending[stage] = self._pending.get(stage, 0) + nanoseconds
+
+    def count(self, name, value=1):
+        """Adds value to the current tick of the counter."""
+        with self._lock:
+            self._counters.add(name)
+            self._pending[name] = self._pending.get(name, 0) + value
+
+    def flush(self):
+        """Ends the current tick: sums of add() and count() calls become samples."""
+        with self._lock:
+            for name, value in self._pending.items():
+                self._append(name, value)
+            self._pending.clear()
+
+    def percentile(self, name, percent):
+        """Returns the percent-th percentile of samples of the stage or counter, None if there are none."""
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, len(samples) * percent // 100)]
+
+    def summary(self):
+        """Returns {name: {'unit', 'samples', 'p50', 'p99', 'max'}} of all stages and counters."""
+        result = OrderedDict()
+        for name in self.names:
+            with self._lock:
+                samples = sorted(self._samples[name])
+            result[name] = {
+                'unit': 'count' if name in self._counters else 'ns',
+                'samples': len(samples),
+                'p50': samples[len(samples) * 50 // 100],
+                'p99': samples[min(len(samples) - 1, len(samples) * 99 // 100)],
+                'max': samples[-1],
+            }
+        return result
+
+    def dump(self, filename):
+        """Writes summary() into the JSON file."""
+        with open(filename, 'w') as file:
+            json.dump(self.summary(), file, indent=2)
+
+    @property
+    def names(self):
+        """:obj:`list` of :obj:`str`: Names of stages and counters in order of the first sample."""
+        with self._lock:
+            return list(self._samples)
+
+    def _append(self, name, value):
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self._window)
+        samples.append(value)
+
+
+ProcessColumn = namedtuple('ProcessColumn', ['name', 'header', 'attribute', 'files'])
+ProcessColumn.__doc__ = """Column of process table: Process attribute it shows and /proc/[pid]/ files the attribute needs."""
+
+
 class Process:
     """
         Information about running process with PID.
@@ -272,32 +594,89 @@ class Process:
             >>> proc.pid, proc.priority, proc.niceness
             (1, 20, 0)
 
+        Only files needed by the active columns (see set_columns()) are read; stat is always read.
+
         Attributes:
             update(): Retrieves actual process statistics from /proc/[pid]/ subdirectory.
+            update_details(): Retrieves statistics which stat does not provide (command line, status, ...).
+            apply(): Updates process statistics from already parsed stat and status files.
+            invalidate_command(): Makes the next update re-read the command line.
+            clock(): Returns timestamp of samples in seconds since boot.
             pid: process PID
-            user: process user
+            uid: process owner UID
+            user: process user name (resolved if UserNames are set)
             priority: process kernel-space priority
             niceness: process user-space niceness
             virtual_memory: virtual memory requested by process
             resident_memory: resident memory usage (currently being used)
             shared_memory: shared memory used
             state: process state
+            threads: number of threads
+            kthread: True for kernel threads
             cpu_usage: percentage of CPU time process is currently using
             memory_usage: task's current share of the phisical memory
             time(): returns processor time used by process
             command: command that launched process
+            io_read: bytes read from storage (None if not permitted)
+            io_write: bytes written to storage (None if not permitted)
+            pss: proportional set size (None if not permitted)
+            columns: registry of ProcessColumn by name
 
         .. PROC(5)
             http://man7.org/linux/man-pages/man5/proc.5.html
         """
 
+    StatInfo = namedtuple('StatInfo', ['comm', 'state', 'ppid', 'flags', 'utime', 'stime', 'cutime', 'cstime',
+                                       'priority', 'nice', 'num_threads', 'starttime', 'vsize', 'rss'])
+
+    _PF_KTHREAD = 0x00200000
+
+    columns = OrderedDict((column.name, column) for column in (
+        ProcessColumn('PID', 'PID', 'pid', ()),
+        ProcessColumn('USER', 'USER', 'user', ()),
+        ProcessColumn('PRIORITY', 'PRI', 'priority', ('stat',)),
+        ProcessColumn('NICE', 'NI', 'niceness', ('stat',)),
+        ProcessColumn('M_VIRT', 'VIRT', 'virtual_memory', ('stat',)),
+        ProcessColumn('M_RESIDENT', 'RES', 'resident_memory', ('stat',)),
+        ProcessColumn('M_SHARE', 'SHR', 'shared_memory', ('statm',)),
+        ProcessColumn('STATE', 'S', 'state', ('stat',)),
+        ProcessColumn('PERCENT_CPU', 'CPU%', 'cpu_usage', ('stat',)),
+        ProcessColumn('PERCENT_MEM', 'MEM%', 'memory_usage', ('stat',)),
+        ProcessColumn('TIME', 'TIME+', 'time', ('stat',)),
+        ProcessColumn('COMM', 'Command', 'command', ('cmdline',)),
+        ProcessColumn('IO_READ', 'DISK R', 'io_read', ('io',)),
+        ProcessColumn('IO_WRITE', 'DISK W', 'io_write', ('io',)),
+        ProcessColumn('M_PSS', 'PSS', 'pss', ('smaps_rollup',)),
+        ProcessColumn('SAMPLE_AGE', 'AGE', 'sample_age', ('stat',)),
+    ))
+    default_columns = ('PID', 'USER', 'PRIORITY', 'NICE', 'M_VIRT', 'M_RESIDENT', 'M_SHARE', 'STATE', 'PERCENT_CPU',
+                       'PERCENT_MEM', 'TIME', 'COMM')
+
+    # thousands of processes are alive at once, so no per-instance __dict__
+    __slots__ = ('pid', '_file_cache', 'user', 'priority', 'niceness', 'virtual_memory', 'resident_memory',
+                 'shared_memory', 'state', 'cpu_usage', '_time', 'command', '_time_ticks_old', '_timestamp_old', '_comm',
+                 '_starttime', '_cmdline_key', 'kthread', 'threads', 'uid', 'idle_samples', 'samples_to_skip',
+                 'io_read', 'io_write', 'pss')
+
     _proc_folder = '/proc'
     _clock_ticks_per_second = os.sysconf(os.sysconf_names['SC_CLK_TCK'])
+    _page_size_kb = os.sysconf('SC_PAGE_SIZE') // 1024
+    # /proc/uptime has a resolution of 10 ms and Uptime truncates it to seconds, this clock has nanoseconds
+    _clock_id = getattr(time, 'CLOCK_BOOTTIME', time.CLOCK_MONOTONIC)
     _uptime = None
     _total_memory = None
-
-    def __init__(self, pid):
+    _user_names = None
+    _stage_timer = None
+    # files read besides stat, a union of files of the active columns (see set_columns())
+    _files = frozenset()
+    # equal UIDs of thousands of processes share one int object, like sys.intern() does for strings
+    _uid_objects = {}
+
+    def __init__(self, pid, file_cache=None, stat_info=None, status=None, uid=None, details=True, timestamp=None,
+                 statm=None):
         self.pid = pid
+        self._file_cache = file_cache  # ProcFileCache, files are opened on every read if not set
+        self.uid = uid  # owner of /proc/[pid], taken from status if not known
         self.user = None
         self.priority = None
         self.niceness = None
@@ -306,95 +685,315 @@ class Process:
         self.shared_memory = 0
         self.state = None
         self.cpu_usage = 0.0
-        self.memory_usage = 0.0
         self._time = 0.0
         self.command = ''
+        self.io_read = 0
+        self.io_write = 0
+        self.pss = 0
 
         self._time_ticks_old = None
-        self._uptime_old = None
+        self._timestamp_old = None
 
-        self.kthread = False # TODO(AOS) What for?
-        self.update()
+        # cmdline is cached until the process identity (comm, starttime) changes
+        self._comm = None
+        self._starttime = None
+        self._cmdline_key = None
 
-    def update(self):
-        """Retrieves actual process statistics from /proc/[pid]/ subdirectory."""
+        self.kthread = False
+        self.threads = 0
+
+        # sampling schedule maintained by ProcessesController in adaptive sampling mode
+        self.idle_samples = 0
+        self.samples_to_skip = 0
+
+        # stat (and status) may be already parsed by a collector, otherwise files are read here
+        if stat_info is None:
+            self.update(details, timestamp)
+        else:
+            self.apply(stat_info, status, details, timestamp, statm=statm)
+
+    def update(self, details=True, timestamp=None, uid=None):
+        """Retrieves actual process statistics from /proc/[pid]/ subdirectory.
+
+        Without details only stat is read, which is enough for CPU and memory usage (see update_details()).
+        timestamp (see clock()) is the time of the sample, uptime object (see set_uptime()) is used if not given.
+        uid is the owner of /proc/[pid] if known, it is kept even if the PID was reused meanwhile.
+        """
+        data = self._read_file('stat')
+        timer = Process._stage_timer
         try:
-            self._read_cmdline()
-            self._read_stat()
-            self._read_status()
-        except (ValueError, IndexError):
+            if timer is None:
+                stat_info = Process._parse_stat(data)
+            else:
+                start = time.perf_counter_ns()
+                stat_info = Process._parse_stat(data)
+                timer.add('stat parse', time.perf_counter_ns() - start)
+        except (ValueError, IndexError, KeyError):
             raise SystemInfoError('Error while parsing /proc/[pid]/ subdirectory')
 
+        self.apply(stat_info, details=False, timestamp=timestamp, uid=uid)
+        if details:
+            self.update_details()
+
+    def update_details(self):
+        """Retrieves statistics which stat does not provide.
+
+        Only files of the active columns are read and cmdline is re-read only after exec() (detected by changed
+        comm or starttime).
+        """
+        try:
+            # owner of a standalone Process (not listed by ProcessesController) is known only from status
+            status_read = 'status' in Process._files or self.uid is None
+            if status_read:
+                data = self._read_file('status')
+                timer = Process._stage_timer
+                if timer is None:
+                    self._apply_status(Process._parse_status(data))
+                else:
+                    start = time.perf_counter_ns()
+                    self._apply_status(Process._parse_status(data))
+                    timer.add('status parse', time.perf_counter_ns() - start)
+            self._read_details(status_read)
+            self._resolve_user()
+        except (ValueError, IndexError, KeyError):
+            raise SystemInfoError('Error while parsing /proc/[pid]/ subdirectory')
+
+    def apply(self, stat_info, status=None, details=True, timestamp=None, uid=None, statm=None):
+        """Updates process statistics from already parsed stat (StatInfo), status (dict) and statm (tuple) files.
+
+        Without details cmdline is not read and comm stands for the command of a new process. timestamp and uid are
+        the same as of update(). statm is read if the active columns need it and it is not given.
+        """
+        try:
+            self._apply_stat(stat_info, timestamp)
+            if uid is not None:
+                self.uid = uid
+            if status is not None:
+                self._apply_status(status)
+            if details:
+                self._read_details(status is not None, statm)
+            elif self._cmdline_key != (self._comm, self._starttime):
+                # cmdline of a new process, or of a new image after exec(), is not read yet
+                self.command = self._comm
+            self._resolve_user()
+        except (ValueError, IndexError, KeyError):
+            raise SystemInfoError('Error while parsing /proc/[pid]/ subdirectory')
+
+    def _read_details(self, status_read, statm=None):
+        """Reads files of the active columns except stat and status, statm only if status was not read or given."""
+        files = Process._files
+        if 'statm' in files and not status_read:
+            # a single short line instead of ~55 lines of status
+            if statm is None:
+                statm = Process._parse_statm(self._read_file('statm'))
+            self._apply_statm(statm)
+
+        if 'cmdline' not in files:
+            self.command = self._comm
+        elif self._cmdline_key != (self._comm, self._starttime):
+            self._read_cmdline()
+
+        if 'io' in files:
+            self.io_read, self.io_write = self._read_restricted('io', Process._parse_io, (None, None))
+        if 'smaps_rollup' in files:
+            self.pss = self._read_restricted('smaps_rollup', Process._parse_smaps_rollup, None)
+
+    def invalidate_command(self):
+        """Makes the next update (with details) re-read cmdline, e.g. after exec() which kept comm and starttime."""
+        self._cmdline_key = None
+
+    def _reset_identity(self):
+        """Drops CPU usage history and cached strings of the previous process with the same PID."""
+        self._time_ticks_old = None
+        self._timestamp_old = None
+        self._cmdline_key = None
+        self.command = ''
+        self.uid = None  # read from status unless the owner of /proc/[pid] is passed to update() or apply()
+        self.user = None
+        self.idle_samples = 0
+        self.samples_to_skip = 0
+
+    def _read_restricted(self, name, parse, default):
+        # files of processes of other users are readable only with ptrace access, kernel threads and zombies
+        # have no memory map and report ESRCH (stat was read just before, so the process has not exited)
+        try:
+            data = self._read_file(name)
+        except (PermissionError, ProcessLookupError):
+            return default
+        return parse(data)
+
+    def _resolve_user(self):
+        if self.uid is not None and Process._user_names is not None:
+            self.user = Process._user_names.name(self.uid)
+
+    def _read_file(self, name):
+        timer = Process._stage_timer
+        if timer is None:
+            return self._read_file_untimed(name)
+
+        start = time.perf_counter_ns()
+        try:
+            return self._read_file_untimed(name)
+        finally:
+            timer.add('read', time.perf_counter_ns() - start)
+            if self._file_cache is None:
+                timer.count('files opened')
+
+    def _read_file_untimed(self, name):
+        if self._file_cache is not None:
+            return self._file_cache.read(self.pid, name)
+
+        filename = f'{Process._proc_folder}/{self.pid}/{name}'
+        with open(filename, 'rb') as file:
+            return file.read()
+
     def _read_cmdline(self):
-        filename = f'{Process._proc_folder}/{self.pid}/cmdline'
-        with open(filename, 'r') as file:
-            self.command = Process._remove_whitespaces(file.read())
-
-    def _read_stat(self):
-        filename = f'{Process._proc_folder}/{self.pid}/stat'
-        with open(filename, 'r') as file:
-            values = ['Reserved']
-            values += file.read().split()
-
-            if not self.command:
-                self.command = Process._remove_whitespaces(values[2][1:-1])
-
-            self.kthread = True if int(values[9]) & 0x00200000 else False
-            self.priority = values[18]
-            self.niceness = values[19]
-
-            time_ticks = sum(map(int, values[14:18]))
-            uptime = Process._uptime.uptime
-
-            if self._time_ticks_old is None:
-                self._time_ticks_old = time_ticks
-            if self._uptime_old is None:
-                self._uptime_old = uptime
-
-            seconds = uptime - self._uptime_old
-            if seconds <= 0:
-                self.cpu_usage = 0.0
-            else:
-                ticks_diff = time_ticks - self._time_ticks_old
-                self.cpu_usage = 100 * ((ticks_diff / self._clock_ticks_per_second) / seconds)
+        cmdline = self._read_file('cmdline').decode(errors='replace')
+        # identical command lines of worker processes share one string
+        self.command = sys.intern(Process._remove_whitespaces(cmdline))
+
+        if not self.command:
+            self.command = sys.intern(Process._remove_whitespaces(self._comm))
+        self._cmdline_key = (self._comm, self._starttime)
+
+    def _apply_stat(self, info, timestamp):
+        if self._starttime is not None and info.starttime != self._starttime:
+            # PID was reused by another process between updates
+            self._reset_identity()
+
+        self._comm = sys.intern(info.comm)
+        self._starttime = info.starttime
+        self.state = sys.intern(info.state)
+
+        self.kthread = bool(info.flags & Process._PF_KTHREAD)
+        self.threads = info.num_threads
+        self.priority = sys.intern(str(info.priority))
+        self.niceness = sys.intern(str(info.nice))
+
+        time_ticks = info.utime + info.stime + info.cutime + info.cstime
+        if timestamp is None:
+            timestamp = Process._uptime.uptime
+
+        if self._time_ticks_old is None:
             self._time_ticks_old = time_ticks
-            self._uptime_old = uptime
+        if self._timestamp_old is None:
+            self._timestamp_old = timestamp
+
+        seconds = timestamp - self._timestamp_old
+        if seconds <= 0:
+            self.cpu_usage = 0.0
+        else:
+            ticks_diff = time_ticks - self._time_ticks_old
+            self.cpu_usage = 100 * ((ticks_diff / self._clock_ticks_per_second) / seconds)
+        self._time_ticks_old = time_ticks
+        self._timestamp_old = timestamp
+
+        process_time_ticks = info.utime + info.stime
+        self._time = process_time_ticks / self._clock_ticks_per_second
+
+        # status overrides these figures (and adds shared memory) if it is read
+        self.virtual_memory = info.vsize // 1024
+        self.resident_memory = info.rss * Process._page_size_kb
+
+    @staticmethod
+    def _parse_stat(data):
+        """Parses /proc/[pid]/stat content (bytes) into StatInfo.
+
+        comm (field 2) may contain spaces and parentheses, so it spans from the first '(' to the last ')'.
+        Only fields up to rss (field 24) are split off and converted, the tail of the line is left untouched.
+        Raises ValueError or IndexError on malformed content.
+        """
+        comm_end = data.rindex(b')')
+        comm = data[data.index(b'(') + 1:comm_end].decode(errors='replace')
+        # fields[0] is field 3 (state) of proc(5)
+        fields = data[comm_end + 2:].split(None, 22)
 
-            process_time_ticks = int(values[14]) + int(values[15])
-            self._time = process_time_ticks / self._clock_ticks_per_second
+        return Process.StatInfo(comm, fields[0].decode(), int(fields[1]), int(fields[6]), int(fields[11]),
+                                int(fields[12]), int(fields[13]), int(fields[14]), int(fields[15]),
+                                int(fields[16]), int(fields[17]), int(fields[19]), int(fields[20]),
+                                int(fields[21]))
 
-    def _read_status(self):
-        filename = f'{Process._proc_folder}/{self.pid}/status'
+    @staticmethod
+    def _parse_status(data):
+        """Parses /proc/[pid]/status content (bytes) into dict with Name, State, Uid and memory figures (kB)."""
         status = {}
 
-        with open(filename, 'r') as file:
-            for line in file:
-                temp = line.split()
-                name = temp[0][:-1]
-                if name in ('Name', 'State'):
-                     status[name] = temp[1]
-                if name in ('Uid', 'VmSize', 'VmRSS', 'RssShmem'):
-                    status[name] = int(temp[1])
+        for line in data.decode(errors='replace').splitlines():
+            temp = line.split()
+            name = temp[0][:-1]
+            if name in ('Name', 'State'):
+                status[name] = temp[1]
+            if name in ('Uid', 'VmSize', 'VmRSS', 'RssShmem'):
+                status[name] = int(temp[1])
+
+        return status
+
+    def _apply_status(self, status):
+        # mandatory properties raise exception
+        if not self.command:
+            self.command = status['Name']
+        self.state = sys.intern(status['State'])
+        if self.uid is None:
+            self.uid = Process._uid_objects.setdefault(status['Uid'], status['Uid'])
+
+        # optional properties
+        self.virtual_memory = status.get('VmSize', 0)
+        self.resident_memory = status.get('VmRSS', 0)
+        self.shared_memory = status.get('RssShmem', 0)
+
+    @staticmethod
+    def _parse_statm(data):
+        """Parses /proc/[pid]/statm content (bytes) into (size, resident, shared) tuple of pages."""
+        size, resident, shared, _ = data.split(None, 3)
+        return int(size), int(resident), int(shared)
+
+    def _apply_statm(self, statm):
+        size, resident, shared = statm
+        self.virtual_memory = size * Process._page_size_kb
+        self.resident_memory = resident * Process._page_size_kb
+        # unlike RssShmem of status, shared pages of statm include file-backed ones (as SHR of top and htop)
+        self.shared_memory = shared * Process._page_size_kb
+
+    @staticmethod
+    def _parse_io(data):
+        """Parses /proc/[pid]/io content (bytes) into (read_bytes, write_bytes) tuple."""
+        values = {}
+        for line in data.splitlines():
+            name, _, value = line.partition(b':')
+            values[name] = value
+        return int(values[b'read_bytes']), int(values[b'write_bytes'])
 
-            # mandatory properties raise exception
-            if not self.command:
-                self.command = status['Name']
-            self.state = status['State']
-            user_id = status['Uid']
-            # self.user = pwd.getpwuid( int(user_id)).pw_name  # TODO(AOS) Pycharm creates local environment where there are no other user
+    @staticmethod
+    def _parse_smaps_rollup(data):
+        """Returns Pss (kB) from /proc/[pid]/smaps_rollup content (bytes)."""
+        start = data.index(b'\nPss:') + 5
+        return int(data[start:data.index(b'kB', start)])
 
-            # optional properties
-            self.virtual_memory = status.get('VmSize', 0)
-            self.resident_memory = status.get('VmRSS', 0)
-            self.shared_memory = status.get('RssShmem', 0)
+    @property
+    def memory_usage(self):
+        """:obj:`float`: Task's current share of the physical memory (%), computed on access to save memory."""
+        return round(self.resident_memory * 100 / Process._total_memory, 1)
 
-        memory_usage = self.resident_memory * 100 / Process._total_memory
-        self.memory_usage = round(memory_usage, 1)
+    @property
+    def sample_age(self):
+        """:obj:`float`: Seconds since stat was sampled, large for rows left out by time-budgeted updates."""
+        if self._timestamp_old is None:
+            return 0.0
+        return max(Process.clock() - self._timestamp_old, 0.0)
+
+    @property
+    def identity(self):
+        """:obj:`tuple`: PID and start time (clock ticks after boot), unlike PID unique over the system uptime."""
+        return self.pid, self._starttime
 
     @property
     def time(self):
         """:obj:'str': Returns processor time used by process."""
-        d = timedelta(seconds=float(self._time))
+        return Process._format_time(self._time)
+
+    @staticmethod
+    def _format_time(seconds):
+        d = timedelta(seconds=float(seconds))
 
         hours, remainder = divmod(d.total_seconds(), 3600)
         minutes, seconds = divmod(remainder, 60)
@@ -404,6 +1003,11 @@ class Process:
         else:
             return '%.0f:%05.2f' % (minutes, seconds)
 
+    @staticmethod
+    def clock():
+        """Returns seconds since boot (including suspend, as /proc/uptime) to timestamp samples with."""
+        return time.clock_gettime(Process._clock_id)
+
     @staticmethod
     def set_uptime(obj):
         """Process class requires object with uptime attribute holding actual uptime"""
@@ -414,47 +1018,1350 @@ class Process:
         """Process class requires to know total RAM size (int value)"""
         Process._total_memory = total_memory
 
+    @staticmethod
+    def set_user_names(user_names):
+        """Process class resolves user names with shared UserNames cache (None disables resolution)"""
+        Process._user_names = user_names
+
+    @staticmethod
+    def set_stage_timer(timer):
+        """Process class adds time spent reading and parsing files into StageTimer (None disables timing)"""
+        Process._stage_timer = timer
+
+    @staticmethod
+    def set_columns(names):
+        """Process class reads only files needed by columns (names of Process.columns), stat is always read"""
+        Process._files = frozenset(file for name in names for file in Process.columns[name].files)
+
+    @staticmethod
+    def set_status_required(required):
+        """Enables or disables reading of /proc/[pid]/status (user and memory figures) besides files of columns"""
+        if required:
+            Process._files = Process._files | {'status'}
+        else:
+            Process._files = Process._files - {'status'}
+
     @staticmethod
     def _remove_whitespaces(string):
         return string.replace('\x00', ' ').rstrip()
 
 
+Process.set_columns(Process.default_columns)
+
+
+class SharedMemoryCollector:
+    """
+        Parses /proc/[pid]/ files in a pool of worker processes.
+
+        PIDs are partitioned into contiguous ranges, one per worker. Each worker parses stat (and optionally status
+        or statm) files of its range and packs the values into fixed-width records of a shared memory block, so no
+        per-process objects are pickled between processes. The parent unpacks the records in PID order.
+        cmdline is not collected, Process reads it only after exec().
+
+        Attributes:
+            collect(): Returns parsed stat, status and statm of the given processes.
+            close(): Stops worker processes and releases the shared memory block.
+    """
+
+    # pid, record state, state, ppid, flags, utime, stime, cutime, cstime, priority, nice, num_threads, starttime,
+    # vsize, rss, status present, Uid, VmSize, VmRSS, RssShmem, statm present, size, resident, shared, comm
+    _record = struct.Struct('<iBcqQqqqqqqqQQqBqqqqBqqq64s')
+    _header = struct.Struct('<iB')
+
+    _VANISHED = 0
+    _PARSED = 1
+    _MALFORMED = 2
+
+    def __init__(self, workers):
+        self._workers = workers
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._shared_memory = None
+
+    def collect(self, pids, read_status=True, read_statm=False):
+        """Yields (pid, StatInfo, status dict or None, statm tuple or None) tuples in PID order.
+
+        StatInfo is None for processes which exited before they were parsed, or whose files were cut short by the
+        exit (status without owner, or without memory figures of a process which has a memory map).
+        """
+        pids = sorted(pids, key=int)
+        if not pids:
+            # e.g. all processes are skipped by adaptive sampling or filtered out
+            return
+        self._reserve(len(pids))
+
+        chunk = -(-len(pids) // self._workers)
+        futures = [self._executor.submit(_collect_shard, Process._proc_folder, self._shared_memory.name, first,
+                                         pids[first:first + chunk], read_status, read_statm)
+                   for first in range(0, len(pids), chunk)]
+        for future in futures:
+            future.result()
+
+        buffer = self._shared_memory.buf
+        record = SharedMemoryCollector._record
+        for index, pid in enumerate(pids):
+            offset = index * record.size
+            _, state = SharedMemoryCollector._header.unpack_from(buffer, offset)
+            if state != SharedMemoryCollector._PARSED:
+                yield pid, None, None, None
+                continue
+
+            (_, _, proc_state, ppid, flags, utime, stime, cutime, cstime, priority, nice, num_threads, starttime,
+             vsize, rss, has_status, uid, vm_size, vm_rss, rss_shmem, has_statm, size, resident, shared,
+             comm) = record.unpack_from(buffer, offset)
+            comm = comm.rstrip(b'\x00').decode(errors='replace')
+            stat_info = Process.StatInfo(comm, proc_state.decode(), ppid, flags, utime, stime, cutime, cstime,
+                                         priority, nice, num_threads, starttime, vsize, rss)
+            status = None
+            if has_status:
+                status = {'Name': comm, 'State': proc_state.decode(), 'Uid': uid, 'VmSize': vm_size,
+                          'VmRSS': vm_rss, 'RssShmem': rss_shmem}
+            statm = (size, resident, shared) if has_statm else None
+            yield pid, stat_info, status, statm
+
+    def close(self):
+        """Stops worker processes and releases the shared memory block."""
+        self._executor.shutdown()
+        if self._shared_memory is not None:
+            self._shared_memory.close()
+            self._shared_memory.unlink()
+            self._shared_memory = None
+
+    def _reserve(self, records):
+        size = max(records, 1) * SharedMemoryCollector._record.size
+        if self._shared_memory is not None and self._shared_memory.size >= size:
+            return
+
+        if self._shared_memory is not None:
+            self._shared_memory.close()
+            self._shared_memory.unlink()
+        # grow with a margin, so the block is not re-created on every new process
+        self._shared_memory = shared_memory.SharedMemory(create=True, size=2 * size)
+
+
+_worker_shared_memory = None
+
+
+def _collect_shard(proc_folder, shm_name, first, pids, read_status, read_statm):
+    """SharedMemoryCollector worker: packs parsed stat, status and statm of pids into records from index first."""
+    global _worker_shared_memory
+    if _worker_shared_memory is None or _worker_shared_memory.name != shm_name:
+        if _worker_shared_memory is not None:
+            _worker_shared_memory.close()
+        _worker_shared_memory = shared_memory.SharedMemory(shm_name)
+
+    buffer = _worker_shared_memory.buf
+    record = SharedMemoryCollector._record
+    header = SharedMemoryCollector._header
+
+    for index, pid in enumerate(pids, first):
+        offset = index * record.size
+        try:
+            with open(f'{proc_folder}/{pid}/stat', 'rb') as file:
+                info = Process._parse_stat(file.read())
+            status = {}
+            if read_status:
+                with open(f'{proc_folder}/{pid}/status', 'rb') as file:
+                    status = Process._parse_status(file.read())
+                # kernel threads and zombies have no memory map, hence no memory figures
+                required = ('Uid',) if info.flags & Process._PF_KTHREAD or info.state in ('Z', 'X') else \
+                    ('Uid', 'VmSize', 'VmRSS')
+                for name in required:
+                    if name not in status:
+                        raise KeyError(name)
+            statm = (0, 0, 0)
+            if read_statm:
+                with open(f'{proc_folder}/{pid}/statm', 'rb') as file:
+                    statm = Process._parse_statm(file.read())
+
+            record.pack_into(buffer, offset, int(pid), SharedMemoryCollector._PARSED, info.state.encode(),
+                             info.ppid, info.flags, info.utime, info.stime, info.cutime, info.cstime, info.priority,
+                             info.nice, info.num_threads, info.starttime, info.vsize, info.rss, read_status,
+                             status.get('Uid', 0), status.get('VmSize', 0), status.get('VmRSS', 0),
+                             status.get('RssShmem', 0), read_statm, *statm, info.comm.encode())
+        except OSError:
+            header.pack_into(buffer, offset, int(pid), SharedMemoryCollector._VANISHED)
+        except (ValueError, IndexError, KeyError, struct.error):
+            header.pack_into(buffer, offset, int(pid), SharedMemoryCollector._MALFORMED)
+
+    return len(pids)
+
+
+class ProcConnector:
+    """
+        Subscription to process lifecycle events of the kernel proc connector.
+
+        Class listens on a NETLINK_CONNECTOR socket for PROC_EVENT_FORK, PROC_EVENT_EXEC and PROC_EVENT_EXIT
+        events, so the process list can be maintained incrementally instead of listing /proc/ on every update.
+        Subscription requires CAP_NET_ADMIN and the initial PID namespace; the kernel acknowledges it only then,
+        so OSError is raised by the constructor if no acknowledgement arrives.
+
+        Attributes:
+            read_events(): Returns events received since the last call.
+            close(): Unsubscribes and closes the netlink socket.
+
+        .. CONNECTOR
+            https://www.kernel.org/doc/html/latest/driver-api/connector.html
+    """
+
+    Event = namedtuple('Event', ['what', 'pid', 'tgid'])
+
+    NETLINK_CONNECTOR = 11
+    CN_IDX_PROC = 1
+    CN_VAL_PROC = 1
+    PROC_CN_MCAST_LISTEN = 1
+    PROC_CN_MCAST_IGNORE = 2
+
+    PROC_EVENT_NONE = 0x00000000
+    PROC_EVENT_FORK = 0x00000001
+    PROC_EVENT_EXEC = 0x00000002
+    PROC_EVENT_EXIT = 0x80000000
+
+    _NLMSG_DONE = 3
+    _nlmsghdr = struct.Struct('=IHHII')  # len, type, flags, seq, pid
+    _cn_msg = struct.Struct('=IIIIHH')  # idx, val, seq, ack, len, flags
+    _proc_event = struct.Struct('=IIQ')  # what, cpu, timestamp_ns
+    _fork_event = struct.Struct('=IIII')  # parent_pid, parent_tgid, child_pid, child_tgid
+    _ids = struct.Struct('=II')  # process_pid, process_tgid (exec, exit)
+
+    _receive_buffer = 4 * 1024 * 1024
+    _ack_timeout = 0.5
+
+    def __init__(self):
+        self._socket = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM | socket.SOCK_CLOEXEC,
+                                     ProcConnector.NETLINK_CONNECTOR)
+        try:
+            # a burst of forks must not overflow the queue between two updates
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, ProcConnector._receive_buffer)
+            self._socket.bind((0, ProcConnector.CN_IDX_PROC))
+            self._control(ProcConnector.PROC_CN_MCAST_LISTEN)
+            self._wait_for_ack()
+            self._socket.setblocking(False)
+        except (OSError, struct.error):
+            self._socket.close()
+            raise
+
+    def read_events(self):
+        """Returns list of Event received since the last call.
+
+        Raises OSError (ENOBUFS) if the socket buffer overflowed and some events were lost.
+        """
+        events = []
+        while True:
+            try:
+                data = self._socket.recv(65536)
+            except BlockingIOError:
+                return events
+            events.extend(ProcConnector._parse_events(data))
+
+    def close(self):
+        """Unsubscribes and closes the netlink socket."""
+        try:
+            self._control(ProcConnector.PROC_CN_MCAST_IGNORE)
+        except OSError:
+            pass
+        self._socket.close()
+
+    def _control(self, operation):
+        port_id = self._socket.getsockname()[0]
+        op = struct.pack('=I', operation)
+        cn_msg = ProcConnector._cn_msg.pack(ProcConnector.CN_IDX_PROC, ProcConnector.CN_VAL_PROC, 0, 0, len(op), 0)
+        length = ProcConnector._nlmsghdr.size + len(cn_msg) + len(op)
+        nlmsghdr = ProcConnector._nlmsghdr.pack(length, ProcConnector._NLMSG_DONE, 0, 0, port_id)
+        self._socket.send(nlmsghdr + cn_msg + op)
+
+    def _wait_for_ack(self):
+        self._socket.settimeout(ProcConnector._ack_timeout)
+        try:
+            while True:
+                data = self._socket.recv(65536)
+                for what, payload in ProcConnector._parse_messages(data):
+                    if what == ProcConnector.PROC_EVENT_NONE and len(payload) >= 4:
+                        error, = struct.unpack_from('=I', payload)
+                        if error:
+                            raise OSError(error, os.strerror(error))
+                        return
+        except socket.timeout:
+            # the kernel ignores requests from other PID namespaces silently
+            raise OSError(errno.ETIMEDOUT, 'proc connector did not acknowledge subscription')
+
+    @staticmethod
+    def _parse_messages(data):
+        """Yields (what, event data) of proc connector messages in netlink datagram."""
+        offset = 0
+        header_size = ProcConnector._nlmsghdr.size + ProcConnector._cn_msg.size + ProcConnector._proc_event.size
+        while offset + ProcConnector._nlmsghdr.size <= len(data):
+            length, msg_type, _, _, _ = ProcConnector._nlmsghdr.unpack_from(data, offset)
+            if length < ProcConnector._nlmsghdr.size or offset + length > len(data):
+                # truncated message
+                return
+            if msg_type == ProcConnector._NLMSG_DONE and length >= header_size:
+                cn_offset = offset + ProcConnector._nlmsghdr.size
+                idx, val, _, _, _, _ = ProcConnector._cn_msg.unpack_from(data, cn_offset)
+                if (idx, val) == (ProcConnector.CN_IDX_PROC, ProcConnector.CN_VAL_PROC):
+                    event_offset = cn_offset + ProcConnector._cn_msg.size
+                    what, _, _ = ProcConnector._proc_event.unpack_from(data, event_offset)
+                    yield what, memoryview(data)[event_offset + ProcConnector._proc_event.size:offset + length]
+            # messages are aligned to 4 bytes (NLMSG_ALIGN)
+            offset += (length + 3) & ~3
+
+    @staticmethod
+    def _parse_events(data):
+        """Parses netlink datagram into list of fork, exec and exit Event, other events are skipped."""
+        events = []
+        for what, payload in ProcConnector._parse_messages(data):
+            if what == ProcConnector.PROC_EVENT_FORK and len(payload) >= ProcConnector._fork_event.size:
+                _, _, pid, tgid = ProcConnector._fork_event.unpack_from(payload)
+            elif what in (ProcConnector.PROC_EVENT_EXEC, ProcConnector.PROC_EVENT_EXIT) and \
+                    len(payload) >= ProcConnector._ids.size:
+                pid, tgid = ProcConnector._ids.unpack_from(payload)
+            else:
+                continue
+            events.append(ProcConnector.Event(what, pid, tgid))
+        return events
+
+
 class ProcessesController:
-    # TODO(AOS) Add docstrings
+    """
+        Table of running processes indexed by PID.
+
+        Class keeps one Process object per running process. Each update() refreshes surviving processes in place,
+        creates objects for newly started processes and evicts the ones that have exited, so a refresh costs
+        O(live processes) and the table never outgrows the actual process list.
+        With persistent_files enabled /proc/[pid]/ files are read through ProcFileCache. With scan_threads > 1
+        processes are scanned in parallel by a thread pool (reading /proc files releases the GIL). With
+        scan_processes > 1 files are parsed by SharedMemoryCollector worker processes instead (both other
+        options are ignored then).
+        With proc_events enabled the PID list is maintained from ProcConnector fork/exec/exit events and /proc/
+        is listed only once (and again if events were lost); exec events also invalidate cached command lines.
+        If the proc connector is not available /proc/ is listed on every update.
+        User names are resolved by UserNames cache shared by all processes.
+        With adaptive_sampling enabled processes idle for several samples (no CPU time consumed, same state and
+        resident memory) are refreshed only every 2nd, 4th and eventually 8th update. Running processes and
+        pinned ones (e.g. visible on screen) are refreshed on every update.
+        With detail_rows > 0 updates run in two phases: only stat is read for all processes, then cmdline and status
+        are read for the first detail_rows processes in the sort order (see set_sort_key()) and the pinned ones.
+        With stage_timer (StageTimer) set, every update adds one sample of time spent listing PIDs ('enumerate'),
+        reading and parsing files ('read', 'stat parse', 'status parse'), of the whole update ('scan') and of the
+        number of files opened. Files parsed by worker processes (scan_processes) are not timed.
+
+        Attributes:
+            update(): Synchronizes the table with /proc/ content.
+            aupdate(): Coroutine version of update().
+            set_user_filter(): Limits the table to processes of one user.
+            set_pinned_pids(): Sets processes refreshed on every update in adaptive sampling mode and read in detail
+                in two-phase mode.
+            set_sort_key(): Sets the order of processes.
+            close(): Releases file descriptors kept open in persistent files mode and stops scan threads/processes.
+            proc_events: True if the PID list is maintained from proc connector events.
+            processes: Process objects of all running processes (sorted if a sort key is set).
+            proccesses_number: Number of running processes.
+            threads_number: Number of threads of user-space processes besides their main threads.
+            kernel_threads_number: Number of kernel threads.
+            processes_pid: List of PIDs of all running processes.
+            update_stats: Numbers of added, removed and updated processes during the last update() call.
+
+        .. PROC(5)
+            http://man7.org/linux/man-pages/man5/proc.5.html
+    """
+
+    UpdateStats = namedtuple('UpdateStats', ['added', 'removed', 'updated'])
+
     _proc_folder = '/proc/'
 
-    def __init__(self, uptime, memory):
-        self._processes = set()
-        self._previous_procceses = set()
+    # refresh intervals (in updates) of processes idle for 0, _idle_samples, 2 * _idle_samples... samples
+    _sampling_intervals = (1, 2, 4, 8)
+    _idle_samples = 3
+    # running and uninterruptible (usually disk) sleep
+    _active_states = frozenset(('R', 'D'))
+    # PIDs scanned between two deadline checks of a time-budgeted update
+    _budget_batch = 256
+
+    def __init__(self, uptime, memory, persistent_files=False, scan_threads=0, scan_processes=0, proc_events=False,
+                 user_names=None, adaptive_sampling=False, detail_rows=0, stage_timer=None):
+        self._processes = {}
+        self._stage_timer = stage_timer
+        self._detail_rows = detail_rows
+        self._sort_key = None
+        self._sort_reverse = False
+        self._adaptive_sampling = adaptive_sampling
+        self._pinned_pids = frozenset()
+        self._cursor = 0
+        self._uids = {}
+        # inode numbers of /proc/[pid]/ from the last two listings and known PIDs forked again, see _pid_reused()
+        self._inodes = {}
+        self._previous_inodes = {}
+        self._forked_pids = set()
+        self._user_filter = None
+        self._connector = None
+        if proc_events:
+            try:
+                # subscribe before the first listing, so no process started meanwhile is missed
+                self._connector = ProcConnector()
+            except OSError:
+                self._connector = None
+        self._resync = True
+        self._update_stats = ProcessesController.UpdateStats(0, 0, 0)
+        self._threads_number = 0
+        self._kernel_threads_number = 0
+        self._collector = SharedMemoryCollector(scan_processes) if scan_processes > 1 else None
+        if self._collector is not None:
+            # files are parsed by the worker processes
+            persistent_files = False
+            scan_threads = 0
+
+        # PIDs are sharded by value, so every PID is always scanned by the same shard (and its file cache)
+        self._shards = max(scan_threads, 1)
+        self._executor = None
+        if scan_threads > 1:
+            self._executor = ThreadPoolExecutor(max_workers=scan_threads, thread_name_prefix='pytop-scan')
+
+        self._file_caches = None
+        if persistent_files:
+            max_files = ProcFileCache._default_max_files() // self._shards
+            self._file_caches = [ProcFileCache(ProcessesController._proc_folder, max_files=max_files,
+                                               stage_timer=stage_timer) for _ in range(self._shards)]
+
+        self._user_names = user_names if user_names is not None else UserNames()
         Process.set_uptime(uptime)
         Process.set_memory_info(memory)
+        Process.set_user_names(self._user_names)
+        Process.set_stage_timer(stage_timer)
         self.update()
 
-    def update(self):
-        actual_processes = {name for name in os.listdir(ProcessesController._proc_folder)
-                            if os.path.isdir(ProcessesController._proc_folder + name) and name.isdigit()}
+    def update(self, deadline=None):
+        """Synchronizes the table with /proc/ content: refreshes, adds and evicts processes.
+
+        With deadline (a Process.clock() timestamp) processes are scanned round-robin in batches until the deadline
+        passes and the next update resumes after the last scanned PID, so the duration of an update is bounded.
+        Processes left out keep their previous values, their Process.sample_age tells how stale they are.
+        """
+        start = time.perf_counter_ns()
+        self._user_names.refresh()
+        actual_pids = self._timed('enumerate', self._actual_pids)
+        obsolete = self._evict_obsolete(actual_pids)
+        self._uids = actual_pids
+        due_pids, skipped = self._due_pids(actual_pids)
+
+        if deadline is None:
+            results = self._scan(due_pids)
+        else:
+            results = []
+            pids = self._round_robin(due_pids)
+            batch_size = ProcessesController._budget_batch
+            for first in range(0, len(pids), batch_size):
+                if first and Process.clock() >= deadline:
+                    # the rest is scanned by the next updates
+                    results.append(self._skip(pids[first:]))
+                    break
+                batch = pids[first:first + batch_size]
+                results.extend(self._scan(batch))
+                self._cursor = int(batch[-1])
+
+        self._merge(obsolete, results + [skipped])
+        if self._detail_rows:
+            self._update_details()
+        self._end_tick(start)
+
+    async def aupdate(self, concurrency=8, batch_size=64, deadline=None):
+        """Coroutine version of update() which does not block the running event loop.
+
+        /proc/[pid]/ files are read in the loop's default executor in batches of batch_size processes,
+        at most concurrency batches at a time. Batches which would start after the deadline are left for the next
+        updates (see update()). Worker processes (scan_processes) parse all PIDs in one job, or batch by batch if a
+        deadline is given.
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter_ns()
+        self._user_names.refresh()
+        actual_pids = await loop.run_in_executor(None, self._timed, 'enumerate', self._actual_pids)
+        obsolete = self._evict_obsolete(actual_pids)
+        self._uids = actual_pids
+        due_pids, skipped = self._due_pids(actual_pids)
+        if deadline is not None:
+            due_pids = self._round_robin(due_pids)
+
+        if self._collector is not None and deadline is None:
+            results = [await loop.run_in_executor(None, self._merge_records, due_pids)]
+        elif self._collector is not None:
+            results = []
+            for first in range(0, len(due_pids), batch_size):
+                if first and Process.clock() >= deadline:
+                    results.append(self._skip(due_pids[first:]))
+                    break
+                batch = due_pids[first:first + batch_size]
+                results.append(await loop.run_in_executor(None, self._merge_records, batch))
+                self._cursor = int(batch[-1])
+        else:
+            batches = []
+            for shard, pids in enumerate(self._split(due_pids)):
+                if self._file_caches is not None:
+                    # a file cache must not be used by two threads at once
+                    if pids:
+                        batches.append((shard, pids))
+                else:
+                    batches.extend((shard, pids[first:first + batch_size])
+                                   for first in range(0, len(pids), batch_size))
+            if deadline is not None:
+                # batches start in round-robin order, so the scanned ones precede the ones left out
+                position = {pid: index for index, pid in enumerate(due_pids)}
+                batches.sort(key=lambda batch: position[batch[1][0]])
+
+            semaphore = asyncio.Semaphore(concurrency)
+            scanned = []
+
+            async def scan(shard, pids):
+                async with semaphore:
+                    if deadline is not None and scanned and Process.clock() >= deadline:
+                        return self._skip(pids)
+                    scanned.append(pids)
+                    return await loop.run_in_executor(None, self._scan_shard, shard, pids)
+
+            results = await asyncio.gather(*(scan(shard, pids) for shard, pids in batches))
+            if deadline is not None and scanned:
+                self._cursor = int(scanned[-1][-1])
+
+        self._merge(obsolete, list(results) + [skipped])
+        if self._detail_rows:
+            await loop.run_in_executor(None, self._update_details)
+        self._end_tick(start)
+
+    def close(self):
+        """Releases file descriptors kept open in persistent files mode and stops scan threads/processes."""
+        if self._executor is not None:
+            self._executor.shutdown()
+        if self._collector is not None:
+            self._collector.close()
+        if self._file_caches is not None:
+            for cache in self._file_caches:
+                cache.close()
+        if self._connector is not None:
+            self._connector.close()
+
+    def _timed(self, stage, func):
+        """Returns result of func(), its duration is added to the stage if a stage timer is set."""
+        if self._stage_timer is None:
+            return func()
+        start = time.perf_counter_ns()
+        try:
+            return func()
+        finally:
+            self._stage_timer.add(stage, time.perf_counter_ns() - start)
+
+    def _end_tick(self, start):
+        """Adds duration of the update started at start (a perf_counter_ns() value), sums of stages become samples."""
+        if self._stage_timer is not None:
+            self._stage_timer.add('scan', time.perf_counter_ns() - start)
+            self._stage_timer.flush()
+
+    def _actual_pids(self):
+        """Returns {pid: uid} of running processes, from proc connector events if possible."""
+        self._forked_pids = set()
+        if self._connector is not None and not self._resync:
+            try:
+                pids = self._apply_events(self._connector.read_events())
+                self._previous_inodes = self._inodes
+                return pids
+            except OSError:
+                # socket buffer overflowed and events were lost, /proc/ has to be listed again
+                pass
+
+        self._resync = False
+        self._previous_inodes = self._inodes
+        self._inodes = {}
+        return self._read_pids(self._user_filter, self._inodes)
+
+    def _apply_events(self, events):
+        """Applies proc connector events to {pid: uid} of the last update and returns the result."""
+        pids = dict(self._uids)
+
+        for what, pid, tgid in events:
+            if pid != tgid:
+                # threads are not listed as processes
+                continue
+            pid = str(pid)
+            if what == ProcConnector.PROC_EVENT_EXIT:
+                pids.pop(pid, None)
+                continue
+
+            if what == ProcConnector.PROC_EVENT_FORK and pid in self._processes:
+                # the known process exited and its PID was reused
+                self._forked_pids.add(pid)
+            elif what == ProcConnector.PROC_EVENT_EXEC:
+                process = self._processes.get(pid)
+                if process is not None:
+                    # comm and starttime of the new image may be the same, so the cache key is not enough
+                    process.invalidate_command()
+
+            # exec of a set-user-ID program changes the owner as well
+            try:
+                owner = os.stat(ProcessesController._proc_folder + pid).st_uid
+            except FileNotFoundError:
+                # process exited meanwhile, the exit event is already queued
+                pids.pop(pid, None)
+                continue
+            if self._user_filter is None or owner == self._user_filter:
+                pids[pid] = owner
+            else:
+                pids.pop(pid, None)
+
+        return pids
+
+    def _evict_obsolete(self, actual_pids):
+        obsolete = self._processes.keys() - actual_pids
+        for pid in obsolete:
+            self._forget(pid)
+        return obsolete
+
+    def _scan(self, pids):
+        """Scans pids by the worker processes, the scan threads or sequentially, returns _scan_shard() results."""
+        if self._collector is not None:
+            return [self._merge_records(pids)]
+        if self._executor is None:
+            return [self._scan_shard(0, pids)]
+        return list(self._executor.map(self._scan_shard, range(self._shards), self._split(pids)))
+
+    def _round_robin(self, pids):
+        """Returns pids in PID order starting after the PID the previous time-budgeted update stopped at."""
+        pids = sorted(pids, key=int)
+        first = next((index for index, pid in enumerate(pids) if int(pid) > self._cursor), 0)
+        return pids[first:] + pids[:first]
+
+    def _skip(self, pids):
+        """Returns _scan_shard() result tuple for processes of pids which are not refreshed by this update.
+
+        A process whose PID was reused meanwhile is reported as vanished, so the new one does not show its values
+        until it is scanned.
+        """
+        vanished = []
+        threads = 0
+        kernel_threads = 0
+        for pid in pids:
+            process = self._processes.get(pid)
+            if process is None:
+                # started recently, added once it is scanned
+                continue
+            if self._pid_reused(pid):
+                vanished.append(pid)
+                continue
+            if process.kthread:
+                kernel_threads += 1
+            else:
+                threads += process.threads - 1
+        return [], vanished, 0, threads, kernel_threads
+
+    def _pid_reused(self, pid):
+        """True if pid may belong to a process started since the last update rather than to the known one.
+
+        Scanned processes are told apart by starttime, this is the check for the ones an update skips. A new process
+        gets a new /proc/[pid]/ inode; the number also changes if the kernel evicted an unused inode, which only
+        costs a rescan.
+        """
+        if pid in self._forked_pids:
+            return True
+        inode = self._inodes.get(pid)
+        return inode is not None and self._previous_inodes.get(pid, inode) != inode
+
+    def _split(self, pids):
+        shards = [[] for _ in range(self._shards)]
+        for pid in pids:
+            shards[int(pid) % self._shards].append(pid)
+        return shards
+
+    def _merge(self, obsolete, results):
+        # results are merged in shard order and new processes are added in PID order
+        new = []
+        updated = 0
+        threads = 0
+        kernel_threads = 0
+        for shard_new, shard_vanished, shard_updated, shard_threads, shard_kernel_threads in results:
+            new.extend(shard_new)
+            updated += shard_updated
+            threads += shard_threads
+            kernel_threads += shard_kernel_threads
+            for pid in shard_vanished:
+                self._forget(pid)
+                obsolete.add(pid)
+
+        new.sort(key=lambda process: int(process.pid))
+        for process in new:
+            self._processes[process.pid] = process
+
+        self._update_stats = ProcessesController.UpdateStats(len(new), len(obsolete), updated)
+        self._threads_number = threads
+        self._kernel_threads_number = kernel_threads
+
+    def _scan_shard(self, shard, pids):
+        """Refreshes known processes and creates new ones; may run in a worker thread, so the table is not modified.
+
+        Returns a tuple of new Process objects, PIDs of processes which exited meanwhile, the number of
+        refreshed processes and numbers of user-space (besides main) and kernel threads of scanned processes.
+        """
+        file_cache = self._file_caches[shard] if self._file_caches is not None else None
+        # one timestamp per batch, CPU usage is computed from the interval between samples of a process
+        timestamp = Process.clock()
+        new = []
+        vanished = []
+        updated = 0
+        threads = 0
+        kernel_threads = 0
+
+        for pid in pids:
+            process = self._processes.get(pid)
+            try:
+                if process is None:
+                    process = Process(pid, file_cache, uid=self._uids[pid], details=not self._detail_rows,
+                                      timestamp=timestamp)
+                    new.append(process)
+                else:
+                    activity = self._activity(process)
+                    process.update(not self._detail_rows, timestamp, self._uids[pid])
+                    self._schedule(process, activity)
+                    updated += 1
+            except (OSError, SystemInfoError):
+                # process exited after /proc/ was listed, files of an exiting process may be truncated
+                if process is not None:
+                    vanished.append(pid)
+                continue
+
+            if process.kthread:
+                kernel_threads += 1
+            else:
+                threads += process.threads - 1
+
+        return new, vanished, updated, threads, kernel_threads
+
+    def _merge_records(self, pids):
+        """Applies records of SharedMemoryCollector, returns the same tuple as _scan_shard()."""
+        new = []
+        vanished = []
+        updated = 0
+        threads = 0
+        kernel_threads = 0
+
+        details = not self._detail_rows
+        timestamp = Process.clock()
+        read_status = 'status' in Process._files and details
+        # like Process, statm is read only if status is not
+        read_statm = 'statm' in Process._files and details and not read_status
+        for pid, stat_info, status, statm in self._collector.collect(pids, read_status, read_statm):
+            process = self._processes.get(pid)
+            if stat_info is None:
+                # process exited after /proc/ was listed
+                if process is not None:
+                    vanished.append(pid)
+                continue
+
+            try:
+                if process is None:
+                    process = Process(pid, stat_info=stat_info, status=status, uid=self._uids[pid], details=details,
+                                      timestamp=timestamp, statm=statm)
+                    new.append(process)
+                else:
+                    activity = self._activity(process)
+                    process.apply(stat_info, status, details, timestamp, self._uids[pid], statm)
+                    self._schedule(process, activity)
+                    updated += 1
+            except (OSError, SystemInfoError):
+                # process exited after /proc/ was listed, files of an exiting process may be truncated
+                if process is not None:
+                    vanished.append(pid)
+                continue
+
+            if process.kthread:
+                kernel_threads += 1
+            else:
+                threads += process.threads - 1
+
+        return new, vanished, updated, threads, kernel_threads
+
+    def _update_details(self):
+        """Second phase of the update: reads cmdline and memory files of the first detail_rows and pinned processes."""
+        processes = self._processes
+        if self._sort_key is None:
+            top = itertools.islice(processes.values(), self._detail_rows)
+        elif self._sort_reverse:
+            top = heapq.nlargest(self._detail_rows, processes.values(), key=attrgetter(self._sort_key))
+        else:
+            top = heapq.nsmallest(self._detail_rows, processes.values(), key=attrgetter(self._sort_key))
+        selected = {process.pid: process for process in top}
+        selected.update((pid, processes[pid]) for pid in self._pinned_pids if pid in processes)
+
+        vanished = 0
+        for pid, process in selected.items():
+            try:
+                process.update_details()
+            except (OSError, SystemInfoError):
+                # process exited after its stat was read, its files may be truncated then
+                self._forget(pid)
+                vanished += 1
+
+        if vanished:
+            stats = self._update_stats
+            self._update_stats = stats._replace(removed=stats.removed + vanished)
+
+    def _due_pids(self, actual_pids):
+        """Returns list of PIDs to refresh and _scan_shard() result tuple for processes skipped by this update."""
+        if not self._adaptive_sampling:
+            return list(actual_pids), ([], [], 0, 0, 0)
+
+        due = []
+        skipped = []
+        for pid in actual_pids:
+            process = self._processes.get(pid)
+            if process is None or process.samples_to_skip == 0 or pid in self._pinned_pids or self._pid_reused(pid):
+                due.append(pid)
+                continue
+
+            process.samples_to_skip -= 1
+            skipped.append(pid)
+
+        return due, self._skip(skipped)
+
+    def _activity(self, process):
+        if not self._adaptive_sampling:
+            return None
+        return process.state, process._time_ticks_old, process.resident_memory
+
+    def _schedule(self, process, activity):
+        """Sets the number of updates which skip a process from its activity since the previous refresh."""
+        if activity is None:
+            return
+
+        intervals = ProcessesController._sampling_intervals
+        # both counters stay small, so no int objects are allocated per process
+        max_idle_samples = ProcessesController._idle_samples * (len(intervals) - 1)
+        if activity == self._activity(process) and process.state not in ProcessesController._active_states:
+            process.idle_samples = min(process.idle_samples + 1, max_idle_samples)
+        else:
+            process.idle_samples = 0
+
+        process.samples_to_skip = intervals[process.idle_samples // ProcessesController._idle_samples] - 1
+
+    def _forget(self, pid):
+        del self._processes[pid]
+        self._uids.pop(pid, None)
+        if self._file_caches is not None:
+            self._file_caches[int(pid) % self._shards].evict(pid)
+
+    def set_user_filter(self, uid):
+        """Limits the table to processes owned by uid (None shows all), other processes are not read at all."""
+        self._user_filter = uid
+        self._resync = True
+
+    def set_pinned_pids(self, pids):
+        """Sets PIDs (e.g. of rows on screen) refreshed on every update and read in detail in two-phase mode."""
+        self._pinned_pids = frozenset(str(pid) for pid in pids)
+
+    def set_sort_key(self, name, reverse=False):
+        """Sorts processes by Process attribute name (e.g. 'cpu_usage'), None keeps them in PID order."""
+        self._sort_key = name
+        self._sort_reverse = reverse
 
-        obsolete = self._previous_procceses - actual_processes
-        new = actual_processes - self._previous_procceses
+    @staticmethod
+    def _read_pids(uid=None, inodes=None):
+        """Returns {pid: uid} of processes (owned by uid if given), stores {pid: inode number} into inodes if given.
+
+        The directory type comes from d_type of scandir() entries, so the only syscall per process is the stat()
+        of its directory, which provides the owner without parsing /proc/[pid]/status.
+        """
+        pids = {}
+        owners = {}
+        with os.scandir(ProcessesController._proc_folder) as entries:
+            for entry in entries:
+                if not entry.name.isdigit() or not entry.is_dir(follow_symlinks=False):
+                    continue
+                try:
+                    info = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    # process exited meanwhile
+                    continue
+                owner = info.st_uid
+                if uid is None or owner == uid:
+                    # processes of the same user share one int object
+                    pids[entry.name] = owners.setdefault(owner, owner)
+                    if inodes is not None:
+                        inodes[entry.name] = info.st_ino
+        return pids
 
-        for process in self._processes:
-            if process.name in obsolete:
-                del process
-        for pid in new:
-            self._processes.add(Process(pid))
-        self._previous_procceses = actual_processes
+    @property
+    def proc_events(self):
+        """:obj:`bool`: True if the PID list is maintained from proc connector events."""
+        return self._connector is not None
 
     @property
     def processes(self):
-        return self._processes
+        """:obj:`dict_values` or :obj:`list`: Process objects of all running processes, sorted if sort key is set."""
+        if self._sort_key is None:
+            return self._processes.values()
+        return sorted(self._processes.values(), key=attrgetter(self._sort_key), reverse=self._sort_reverse)
 
     @property
     def proccesses_number(self):
+        """:obj:`int`: Number of running processes."""
         return len(self._processes)
 
+    @property
+    def threads_number(self):
+        """:obj:`int`: Number of threads of user-space processes besides their main threads."""
+        return self._threads_number
+
+    @property
+    def kernel_threads_number(self):
+        """:obj:`int`: Number of kernel threads."""
+        return self._kernel_threads_number
+
     @property
     def processes_pid(self):
-        return [int(process.pid) for process in self._processes]
+        """:obj:`list` of :obj:`int`: List of PIDs of all running processes."""
+        return [int(pid) for pid in self._processes]
+
+    @property
+    def update_stats(self):
+        """:obj:`UpdateStats`: Numbers of added, removed and updated processes during the last update() call."""
+        return self._update_stats
+
+
+class ProcessTable:
+    """
+        Statistics of processes stored column-wise (structure of arrays).
+
+        Numeric columns are array.array objects indexed by slot, strings (commands) are kept in lists. Each PID is
+        mapped to a slot; slots of removed processes are put on a free list and reused. Computations over all
+        processes (CPU usage, sorting, filtering) run on whole columns, with NumPy when use_numpy is set and NumPy
+        is installed.
+
+        Attributes:
+            add(): Returns slot for a new process.
+            remove(): Releases slot of the process.
+            slot(): Returns slot of the process or None.
+            column(): Returns the column array.
+            update_cpu_usage(): Computes CPU usage of all processes from ticks deltas.
+            sorted_slots(): Returns slots of all processes ordered by a column.
+            filter_slots(): Returns slots of processes with a given column value.
+            pids: PIDs of all processes.
+            commands: Commands of processes indexed by slot.
+    """
+
+    _typecodes = {'pid': 'l', 'ppid': 'l', 'uid': 'L', 'state': 'B', 'priority': 'l', 'nice': 'l', 'vsz': 'Q', 'rss': 'Q',
+                  'shr': 'Q', 'utime': 'Q', 'stime': 'Q', 'ticks': 'Q', 'prev_ticks': 'Q', 'starttime': 'Q',
+                  'flags': 'Q', 'cpu': 'd', 'used': 'B'}
+
+    def __init__(self, use_numpy=False):
+        self._columns = {name: array.array(typecode) for name, typecode in ProcessTable._typecodes.items()}
+        self._slots = {}
+        self._free = []
+        self._numpy = numpy if use_numpy else None
+        self.commands = []
+        self.cmdline_keys = []
+
+    def __len__(self):
+        return len(self._slots)
+
+    def add(self, pid):
+        """Returns slot for a new process, a free slot is reused if there is any."""
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self.commands)
+            for values in self._columns.values():
+                values.append(0)
+            self.commands.append('')
+            self.cmdline_keys.append(None)
+
+        self._slots[pid] = slot
+        self._columns['pid'][slot] = int(pid)
+        self._columns['used'][slot] = 1
+        return slot
+
+    def remove(self, pid):
+        """Releases slot of the process."""
+        slot = self._slots.pop(pid)
+        self._columns['used'][slot] = 0
+        self.commands[slot] = ''
+        self.cmdline_keys[slot] = None
+        self._free.append(slot)
+
+    def slot(self, pid):
+        """Returns slot of the process or None."""
+        return self._slots.get(pid)
+
+    def column(self, name):
+        """Returns the column array indexed by slot."""
+        return self._columns[name]
+
+    @property
+    def pids(self):
+        """:obj:`dict_keys`: PIDs of all processes."""
+        return self._slots.keys()
+
+    def update_cpu_usage(self, seconds, clock_ticks_per_second):
+        """Computes CPU usage (%) of all processes from ticks and prev_ticks columns measured seconds apart."""
+        ticks = self._columns['ticks']
+        prev_ticks = self._columns['prev_ticks']
+
+        if seconds <= 0:
+            factor = 0.0
+        else:
+            factor = 100 / (clock_ticks_per_second * seconds)
+
+        if self._numpy is not None:
+            usage = (self._view('ticks').astype('d') - self._view('prev_ticks')) * factor
+            self._columns['cpu'] = array.array('d', usage.tobytes())
+        else:
+            self._columns['cpu'] = array.array('d', [(new - old) * factor for new, old in zip(ticks, prev_ticks)])
+
+    def sorted_slots(self, name, reverse=False):
+        """Returns slots of all processes ordered by the column, processes with equal values in PID order."""
+        if self._numpy is not None:
+            slots = self._pid_ordered(self._numpy.flatnonzero(self._view('used')))
+            values = self._view(name)[slots]
+            if reverse:
+                # a stable sort of the reversed input, reversed back, keeps ties in PID order
+                return slots[::-1][self._numpy.argsort(values[::-1], kind='stable')][::-1].tolist()
+            return slots[self._numpy.argsort(values, kind='stable')].tolist()
+
+        values = self._columns[name]
+        slots = sorted(self._slots.values(), key=self._columns['pid'].__getitem__)
+        return sorted(slots, key=values.__getitem__, reverse=reverse)
+
+    def filter_slots(self, name, value):
+        """Returns slots of processes whose column equals value, in PID order."""
+        if self._numpy is not None:
+            mask = (self._view(name) == value) & (self._view('used') == 1)
+            return self._pid_ordered(self._numpy.flatnonzero(mask)).tolist()
+
+        values = self._columns[name]
+        return sorted((slot for slot in self._slots.values() if values[slot] == value),
+                      key=self._columns['pid'].__getitem__)
+
+    def _pid_ordered(self, slots):
+        return slots[self._numpy.argsort(self._view('pid')[slots], kind='stable')]
+
+    def _view(self, name):
+        # zero-copy view, must not outlive the call, as an exported array cannot be resized
+        values = self._columns[name]
+        return self._numpy.frombuffer(values, dtype=values.typecode)
+
+
+class ColumnarProcessesController(AsyncUpdateMixin):
+    """
+        Table of running processes stored in ProcessTable instead of Process objects.
+
+        Alternative to ProcessesController for hosts with tens of thousands of processes: memory per process is a
+        few dozen bytes of array columns and CPU usage, sorting and filtering run over whole columns.
+        /proc/[pid]/status is read only if a column needs it (see Process.set_columns()), otherwise memory figures
+        come from statm (or from stat if no column needs statm). Columns of other files (e.g. io) stay empty. User
+        names are resolved by UserNames cache.
+
+        Attributes:
+            update(): Synchronizes the table with /proc/ content.
+            aupdate(): Coroutine version of update().
+            close(): Does nothing, present for compatibility with ProcessesController.
+            set_pinned_pids(): Does nothing, present for compatibility with ProcessesController.
+            set_sort_key(): Sets the attribute the rows are sorted by.
+            set_user_filter(): Limits the rows to processes owned by the user.
+            table: ProcessTable with statistics of all running processes.
+            processes: Rows (with the same attributes as Process) of all running processes.
+            proccesses_number: Number of running processes.
+            threads_number: Number of threads of user-space processes besides their main threads.
+            kernel_threads_number: Number of kernel threads.
+            processes_pid: List of PIDs of all running processes.
+            update_stats: Numbers of added, removed and updated processes during the last update() call.
+    """
+
+    Row = namedtuple('Row', ['pid', 'user', 'priority', 'niceness', 'virtual_memory', 'resident_memory',
+                             'shared_memory', 'state', 'cpu_usage', 'memory_usage', 'time', 'command', 'io_read',
+                             'io_write', 'pss', 'sample_age'])
+    # ProcessTable columns of Row attributes the rows can be sorted by
+    _sort_columns = {'pid': 'pid', 'user': 'uid', 'priority': 'priority', 'niceness': 'nice', 'virtual_memory': 'vsz',
+                     'resident_memory': 'rss', 'shared_memory': 'shr', 'state': 'state', 'cpu_usage': 'cpu',
+                     'memory_usage': 'rss'}
+
+    def __init__(self, uptime, memory, use_numpy=False, user_names=None):
+        self._table = ProcessTable(use_numpy)
+        self._sort_key = None
+        self._sort_reverse = False
+        self._user_filter = None
+        self._user_names = user_names if user_names is not None else UserNames()
+        self._uptime = uptime
+        self._total_memory = memory
+        self._timestamp_old = None
+        self._update_stats = ProcessesController.UpdateStats(0, 0, 0)
+        self._threads_number = 0
+        self._kernel_threads_number = 0
+        self.update()
+
+    def update(self):
+        """Synchronizes the table with /proc/ content: refreshes, adds and evicts processes."""
+        table = self._table
+        self._user_names.refresh()
+        timestamp = Process.clock()
+        actual_pids = ProcessesController._read_pids()
+        obsolete = table.pids - actual_pids
+        for pid in obsolete:
+            table.remove(pid)
+
+        added = 0
+        updated = 0
+        threads = 0
+        kernel_threads = 0
+        for pid in sorted(actual_pids, key=int):
+            slot = table.slot(pid)
+            try:
+                stat_info = Process._parse_stat(self._read_file(pid, 'stat'))
+                status = None
+                statm = None
+                if 'status' in Process._files:
+                    status = Process._parse_status(self._read_file(pid, 'status'))
+                elif 'statm' in Process._files:
+                    statm = Process._parse_statm(self._read_file(pid, 'statm'))
+
+                if slot is None:
+                    new_slot = table.add(pid)
+                    self._store(pid, new_slot, stat_info, status, statm)
+                    table.column('uid')[new_slot] = actual_pids[pid]
+                    added += 1
+                else:
+                    self._store(pid, slot, stat_info, status, statm)
+                    table.column('uid')[slot] = actual_pids[pid]
+                    updated += 1
+
+                if stat_info.flags & Process._PF_KTHREAD:
+                    kernel_threads += 1
+                else:
+                    threads += stat_info.num_threads - 1
+            except OSError:
+                # process exited after /proc/ was listed
+                if table.slot(pid) is not None:
+                    table.remove(pid)
+                if slot is not None:
+                    obsolete.add(pid)
+            except (ValueError, IndexError, KeyError):
+                raise SystemInfoError('Error while parsing /proc/[pid]/ subdirectory')
+
+        seconds = timestamp - self._timestamp_old if self._timestamp_old is not None else 0
+        self._timestamp_old = timestamp
+        table.update_cpu_usage(seconds, Process._clock_ticks_per_second)
+
+        self._update_stats = ProcessesController.UpdateStats(added, len(obsolete), updated)
+        self._threads_number = threads
+        self._kernel_threads_number = kernel_threads
+
+    def close(self):
+        """Does nothing, present for compatibility with ProcessesController."""
+        pass
+
+    def set_pinned_pids(self, pids):
+        """Does nothing, present for compatibility with ProcessesController (all processes are refreshed)."""
+        pass
+
+    def set_sort_key(self, name, reverse=False):
+        """Sorts rows by Row attribute name (e.g. 'cpu_usage') over its column, None keeps them in table order."""
+        if name is not None and name not in ColumnarProcessesController._sort_columns:
+            raise ValueError(f'rows cannot be sorted by {name}')
+        self._sort_key = name
+        self._sort_reverse = reverse
+
+    def set_user_filter(self, uid):
+        """Limits the rows to processes owned by uid (None shows all)."""
+        self._user_filter = uid
+
+    def _slots(self):
+        """Returns slots of the rows in display order."""
+        table = self._table
+        if self._sort_key is not None:
+            slots = table.sorted_slots(ColumnarProcessesController._sort_columns[self._sort_key], self._sort_reverse)
+            if self._user_filter is not None:
+                owned = set(table.filter_slots('uid', self._user_filter))
+                slots = [slot for slot in slots if slot in owned]
+            return slots
+        if self._user_filter is not None:
+            return table.filter_slots('uid', self._user_filter)
+        return [table.slot(pid) for pid in table.pids]
+
+    def _store(self, pid, slot, stat_info, status, statm):
+        table = self._table
+        column = table.column
+
+        ticks = stat_info.utime + stat_info.stime + stat_info.cutime + stat_info.cstime
+        cmdline_key = (stat_info.comm, stat_info.starttime)
+        if table.cmdline_keys[slot] is None or column('starttime')[slot] != stat_info.starttime:
+            # new process or PID reused: no CPU usage history
+            column('prev_ticks')[slot] = ticks
+        else:
+            column('prev_ticks')[slot] = column('ticks')[slot]
+        column('ticks')[slot] = ticks
+
+        if table.cmdline_keys[slot] != cmdline_key:
+            cmdline = self._read_file(pid, 'cmdline').decode(errors='replace')
+            table.commands[slot] = Process._remove_whitespaces(cmdline) or stat_info.comm
+            table.cmdline_keys[slot] = cmdline_key
+
+        column('ppid')[slot] = stat_info.ppid
+        column('state')[slot] = ord(stat_info.state)
+        column('priority')[slot] = stat_info.priority
+        column('nice')[slot] = stat_info.nice
+        column('utime')[slot] = stat_info.utime
+        column('stime')[slot] = stat_info.stime
+        column('starttime')[slot] = stat_info.starttime
+        column('flags')[slot] = stat_info.flags
+        if status is not None:
+            column('vsz')[slot] = status.get('VmSize', 0)
+            column('rss')[slot] = status.get('VmRSS', 0)
+            column('shr')[slot] = status.get('RssShmem', 0)
+        elif statm is not None:
+            size, resident, shared = statm
+            column('vsz')[slot] = size * Process._page_size_kb
+            column('rss')[slot] = resident * Process._page_size_kb
+            column('shr')[slot] = shared * Process._page_size_kb
+        else:
+            column('vsz')[slot] = stat_info.vsize // 1024
+            column('rss')[slot] = stat_info.rss * Process._page_size_kb
+            column('shr')[slot] = 0
+
+    @staticmethod
+    def _read_file(pid, name):
+        with open(f'{Process._proc_folder}/{pid}/{name}', 'rb') as file:
+            return file.read()
+
+    @property
+    def table(self):
+        """:obj:`ProcessTable`: Statistics of all running processes."""
+        return self._table
+
+    @property
+    def processes(self):
+        """:obj:`generator`: Rows (with the same attributes as Process) of running processes, sorted and filtered
+        if sort key or user filter is set."""
+        table = self._table
+        column = table.column
+        pid, uid, priority, nice = column('pid'), column('uid'), column('priority'), column('nice')
+        vsz, rss, shr, state, cpu = column('vsz'), column('rss'), column('shr'), column('state'), column('cpu')
+        utime, stime = column('utime'), column('stime')
+        clock_ticks = Process._clock_ticks_per_second
+        # all processes are sampled by every update
+        sample_age = max(Process.clock() - self._timestamp_old, 0.0) if self._timestamp_old is not None else 0.0
+
+        for slot in self._slots():
+            yield ColumnarProcessesController.Row(
+                str(pid[slot]), self._user_names.name(uid[slot]), str(priority[slot]), str(nice[slot]), vsz[slot],
+                rss[slot], shr[slot], chr(state[slot]), cpu[slot], round(rss[slot] * 100 / self._total_memory, 1),
+                Process._format_time((utime[slot] + stime[slot]) / clock_ticks), table.commands[slot], None, None,
+                None, sample_age)
+
+    @property
+    def proccesses_number(self):
+        """:obj:`int`: Number of running processes."""
+        return len(self._table)
+
+    @property
+    def threads_number(self):
+        """:obj:`int`: Number of threads of user-space processes besides their main threads."""
+        return self._threads_number
+
+    @property
+    def kernel_threads_number(self):
+        """:obj:`int`: Number of kernel threads."""
+        return self._kernel_threads_number
+
+    @property
+    def processes_pid(self):
+        """:obj:`list` of :obj:`int`: List of PIDs of all running processes."""
+        return [int(pid) for pid in self._table.pids]
+
+    @property
+    def update_stats(self):
+        """:obj:`UpdateStats`: Numbers of added, removed and updated processes during the last update() call."""
+        return self._update_stats
+
+
+class SnapshotCollector(AsyncUpdateMixin):
+    """
+        Single producer of immutable snapshots of all data sources.
+
+        Class updates CPU, memory, uptime, load average and processes sources once per tick and bundles their values
+        with a common timestamp (see Process.clock()) into a Snapshot. Snapshots hold immutable values only (process
+        rows are namedtuples of column values), so they are handed over to other threads without locks and two
+        consecutive snapshots are compared cheaply (see diff()).
+        With time_budget (seconds) the processes source is updated with a deadline of the tick start plus the budget
+        (see ProcessesController.update()).
+
+        Attributes:
+            update(): Updates all data sources and returns a new snapshot.
+            aupdate(): Coroutine version of update().
+            diff(): Returns PIDs of processes added, removed and changed between two snapshots.
+            snapshot: The latest snapshot.
+    """
+
+    # values of all columns of the registry
+    Row = namedtuple('Row', [column.attribute for column in Process.columns.values()])
+    Snapshot = namedtuple('Snapshot', ['timestamp', 'cpu_usage', 'used_memory', 'total_memory', 'used_swap',
+                                       'total_swap', 'processes_number', 'threads_number', 'kernel_threads_number',
+                                       'running_tasks', 'load_average', 'uptime', 'processes'])
+    Diff = namedtuple('Diff', ['added', 'removed', 'changed'])
+    # sample age grows between snapshots even if nothing else changed
+    _compared = attrgetter(*(field for field in Row._fields if field != 'sample_age'))
+
+    def __init__(self, cpu, memory, uptime, load, processes, time_budget=None):
+        self._sources = (cpu, memory, uptime, load, processes)
+        self._time_budget = time_budget
+        self._snapshot = self._take(Process.clock())
+
+    def update(self):
+        """Updates all data sources and returns a new snapshot timestamped with the start of the tick."""
+        timestamp = Process.clock()
+        cpu, memory, uptime, load, processes = self._sources
+        for source in (cpu, memory, uptime, load):
+            source.update()
+        if self._time_budget is None:
+            processes.update()
+        else:
+            processes.update(deadline=timestamp + self._time_budget)
+        self._snapshot = self._take(timestamp)
+        return self._snapshot
+
+    async def aupdate(self):
+        """Coroutine version of update() which does not block the running event loop."""
+        timestamp = Process.clock()
+        cpu, memory, uptime, load, processes = self._sources
+        await asyncio.gather(cpu.aupdate(), memory.aupdate(), uptime.aupdate(), load.aupdate())
+        if self._time_budget is None:
+            await processes.aupdate()
+        else:
+            await processes.aupdate(deadline=timestamp + self._time_budget)
+        self._snapshot = self._take(timestamp)
+        return self._snapshot
+
+    def _take(self, timestamp):
+        cpu, memory, uptime, load, processes = self._sources
+        values = attrgetter(*SnapshotCollector.Row._fields)
+        rows = tuple(SnapshotCollector.Row._make(values(process)) for process in processes.processes)
+
+        return SnapshotCollector.Snapshot(timestamp, tuple(cpu.cpu_usage), memory.used_memory, memory.total_memory,
+                                          memory.used_swap, memory.total_swap, processes.proccesses_number,
+                                          processes.threads_number, processes.kernel_threads_number,
+                                          cpu.running_tasks, load.load_average_as_string, uptime.uptime_as_string,
+                                          rows)
+
+    @staticmethod
+    def diff(old, new):
+        """Returns Diff with PIDs of processes started, exited and changed (any column but age) between snapshots."""
+        compared = SnapshotCollector._compared
+        old_rows = {row.pid: row for row in old.processes}
+        added = []
+        changed = []
+        for row in new.processes:
+            previous = old_rows.pop(row.pid, None)
+            if previous is None:
+                added.append(row.pid)
+            elif compared(previous) != compared(row):
+                changed.append(row.pid)
+        return SnapshotCollector.Diff(added, list(old_rows), changed)
+
+    @property
+    def snapshot(self):
+        """:obj:`SnapshotCollector.Snapshot`: The latest snapshot."""
+        return self._snapshot
 
 
 class Utility:
@@ -0,0 +1,40 @@
+import asyncio
+import os
+import sys
+import urwid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'src'))
+
+from pytop import AsyncCollector  # noqa: E402
+
+
+class TestAsyncCollector:
+    def test_redraw_after_refresh(self):
+        class Source:
+            snapshot = 0
+
+            async def aupdate(self):
+                Source.snapshot += 1
+                return Source.snapshot
+
+        loop = asyncio.new_event_loop()
+        try:
+            event_loop = urwid.AsyncioEventLoop(loop=loop)
+            main_loop = urwid.MainLoop(urwid.SolidFill(), event_loop=event_loop)
+            refreshes = []
+            draws = []
+            # urwid.MainLoop draws the screen when the event loop enters idle
+            event_loop.enter_idle(lambda: draws.append(len(refreshes)))
+
+            collector = AsyncCollector(Source(), loop, interval=0.01)
+            collector.attach(main_loop, lambda data: refreshes.append(collector.buffer.read()))
+            collector.start()
+            loop.run_until_complete(asyncio.sleep(0.2))
+            collector.stop()
+            loop.run_until_complete(asyncio.gather(collector._task, return_exceptions=True))
+        finally:
+            loop.close()
+
+        assert len(refreshes) >= 3
+        # every refresh is followed by a redraw
+        assert sorted(set(draws)) == list(range(1, len(refreshes) + 1))
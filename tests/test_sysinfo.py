@@ -1,9 +1,18 @@
 from unittest import TestCase
 from unittest.mock import patch, mock_open
-from src.sysinfo import Cpu, SystemInfoError, LoadAverage, Uptime, MemInfo, Process, Utility, ProcessesController
+from src.sysinfo import Cpu, SystemInfoError, LoadAverage, Uptime, MemInfo, Process, Utility, ProcessesController, \
+    ProcFileCache, ProcessTable, ColumnarProcessesController, ProcConnector, UserNames, SnapshotCollector, StageTimer, \
+    SharedMemoryCollector
+import asyncio
+import errno
+import json
+import pwd
 import pytest
 import shutil
 import os
+import struct
+import sys
+import tracemalloc
 
 
 @pytest.fixture()
@@ -59,6 +68,12 @@ class TestCpu:
 
         assert str(ex.value) == 'Cannot parse /proc/stat file'
 
+    def test_running_tasks(self, read_file):
+        data = read_file('tests/test_sysinfo/001_proc_stat')
+        with patch("builtins.open", mock_open(read_data=data)):
+            cpu = Cpu()
+        assert cpu.running_tasks == 8
+
     @pytest.mark.parametrize('expected, filename', usage_vs_files)
     def test_cpu_usage_n_pct(self, read_file, expected, filename):
         data = read_file('tests/test_sysinfo/001_proc_stat')
@@ -169,6 +184,15 @@ class TestUptime:
             assert uptime.uptime == expected
             mock_file.assert_called_with("/proc/uptime")
 
+    def test_aupdate(self, read_file):
+        data = read_file('tests/test_sysinfo/030_uptime')
+        with patch("builtins.open", mock_open(read_data=data)) as mock_file:
+            uptime = Uptime()
+        data = read_file('tests/test_sysinfo/031_uptime')
+        with patch("builtins.open", mock_open(read_data=data)) as mock_file:
+            asyncio.run(uptime.aupdate())
+            assert uptime.uptime == 86400
+
     @pytest.mark.parametrize('expected, filename', result_str_vs_files)
     def test_load_average_as_string(self, read_file, expected, filename):
         data = read_file(filename)
@@ -177,6 +201,14 @@ class TestUptime:
             assert uptime.uptime_as_string == expected
             mock_file.assert_called_with("/proc/uptime")
 
+    def test_proc_folder(self, read_file):
+        data = read_file('tests/test_sysinfo/031_uptime')
+        with patch("builtins.open", mock_open(read_data=data)) as mock_file, \
+                patch.object(Uptime, '_proc_folder', '/tmp/fake_proc'):
+            uptime = Uptime()
+            assert uptime.uptime == 86400
+            mock_file.assert_called_with("/tmp/fake_proc/uptime")
+
 
 class TestMemInfo:
     result_vs_files = [
@@ -219,6 +251,149 @@ class TestMemInfo:
             mock_file.assert_called_with("/proc/meminfo")
 
 
+class TestProcFileCache:
+    @pytest.fixture()
+    def proc_folder(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        return os.path.join(dir_path, 'test_sysinfo/processes/02_processes')
+
+    @pytest.mark.parametrize('name', ['stat', 'status', 'cmdline'])
+    def test_read(self, proc_folder, read_file, name):
+        cache = ProcFileCache(proc_folder)
+        assert cache.read('1', name).decode() == read_file(os.path.join(proc_folder, '1', name))
+        # second read goes through cached descriptors
+        assert cache.read('1', name).decode() == read_file(os.path.join(proc_folder, '1', name))
+        cache.close()
+
+    def test_open_files(self, proc_folder):
+        cache = ProcFileCache(proc_folder)
+        cache.read('1', 'stat')
+        cache.read('1', 'status')
+        cache.read('2', 'stat')
+        assert cache.open_files == 4
+        cache.evict('1')
+        assert cache.open_files == 2
+        cache.close()
+        assert cache.open_files == 0
+
+    def test_max_files(self, proc_folder):
+        cache = ProcFileCache(proc_folder, max_files=4)
+        for pid in ['1', '2', '3', '15', '18']:
+            cache.read(pid, 'stat')
+            assert cache.open_files <= 4
+        cache.close()
+
+    def test_large_file(self, tmp_path):
+        os.mkdir(tmp_path / '1')
+        content = 'x' * 10000
+        (tmp_path / '1' / 'stat').write_text(content)
+        cache = ProcFileCache(str(tmp_path))
+        assert cache.read('1', 'stat').decode() == content
+        cache.close()
+
+    def test_vanished_process(self, tmp_path):
+        os.mkdir(tmp_path / '1')
+        (tmp_path / '1' / 'stat').write_text('1 (init) S')
+        cache = ProcFileCache(str(tmp_path))
+        cache.read('1', 'stat')
+        with pytest.raises(FileNotFoundError):
+            cache.read('1', 'status')
+        assert cache.open_files == 0
+
+
+class TestStageTimer:
+    def test_record(self):
+        timer = StageTimer()
+        for nanoseconds in range(1, 101):
+            timer.record('draw', nanoseconds)
+        assert timer.percentile('draw', 50) == 51
+        assert timer.percentile('draw', 99) == 100
+        assert timer.percentile('markup', 50) is None
+
+    def test_window(self):
+        timer = StageTimer(window=10)
+        for nanoseconds in range(100):
+            timer.record('draw', nanoseconds)
+        assert timer.summary()['draw']['samples'] == 10
+        assert timer.percentile('draw', 0) == 90
+
+    def test_add_and_flush(self):
+        timer = StageTimer()
+        timer.add('stat parse', 3)
+        timer.add('stat parse', 4)
+        timer.count('files opened')
+        timer.count('files opened', 2)
+        assert timer.names == []
+
+        timer.flush()
+        timer.flush()
+        assert timer.names == ['stat parse', 'files opened']
+        summary = timer.summary()
+        assert summary['stat parse'] == {'unit': 'ns', 'samples': 1, 'p50': 7, 'p99': 7, 'max': 7}
+        assert summary['files opened'] == {'unit': 'count', 'samples': 1, 'p50': 3, 'p99': 3, 'max': 3}
+
+    def test_dump(self, tmp_path):
+        timer = StageTimer()
+        timer.record('draw', 5)
+        timer.dump(tmp_path / 'timing.json')
+        with open(tmp_path / 'timing.json') as file:
+            assert json.load(file) == {'draw': {'unit': 'ns', 'samples': 1, 'p50': 5, 'p99': 5, 'max': 5}}
+
+
+class TestUserNames:
+    @pytest.fixture()
+    def passwd(self, tmp_path):
+        filename = tmp_path / 'passwd'
+        filename.write_text('root:x:0:0:root:/root:/bin/bash\n')
+        UserNames._passwd_file = str(filename)
+        yield filename
+        UserNames._passwd_file = '/etc/passwd'
+
+    @staticmethod
+    def getpwuid(uid):
+        users = {0: 'root', 1000: 'alice'}
+        if uid not in users:
+            raise KeyError(f'getpwuid(): uid not found: {uid}')
+        return pwd.struct_passwd((users[uid], 'x', uid, uid, '', '/', '/bin/sh'))
+
+    def test_name(self, passwd):
+        with patch('src.sysinfo.pwd.getpwuid', side_effect=self.getpwuid) as getpwuid:
+            user_names = UserNames()
+            names = [user_names.name(uid) for uid in [0, 1000, 0, 1000, 1000]]
+        assert names == ['root', 'alice', 'root', 'alice', 'alice']
+        assert getpwuid.call_count == user_names.lookups == 2
+
+    def test_unknown_uid(self, passwd):
+        with patch('src.sysinfo.pwd.getpwuid', side_effect=self.getpwuid) as getpwuid:
+            user_names = UserNames()
+            assert user_names.name(4242) == '4242'
+            assert user_names.name(4242) == '4242'
+        assert getpwuid.call_count == 1
+
+    def test_refresh(self, passwd):
+        with patch('src.sysinfo.pwd.getpwuid', side_effect=self.getpwuid) as getpwuid:
+            user_names = UserNames()
+            user_names.name(0)
+            user_names.refresh()
+            user_names.name(0)
+            assert getpwuid.call_count == 1
+
+            stat = os.stat(passwd)
+            os.utime(passwd, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+            user_names.refresh()
+            user_names.name(0)
+            assert getpwuid.call_count == 2
+
+    def test_prewarm(self, passwd):
+        entries = [self.getpwuid(0), self.getpwuid(1000)]
+        with patch('src.sysinfo.pwd.getpwall', return_value=entries) as getpwall, \
+                patch('src.sysinfo.pwd.getpwuid', side_effect=self.getpwuid) as getpwuid:
+            user_names = UserNames(prewarm=True)
+            assert [user_names.name(0), user_names.name(1000)] == ['root', 'alice']
+        getpwall.assert_called_once()
+        getpwuid.assert_not_called()
+
+
 class TestProcess:
     process1 = {'pid': '1', 'user': 'root', 'priority': '20', 'niceness': '0', 'virtual_memory': '220M',
                 'resident_memory': '7779', 'shared_memory': '3384', 'state': 'S', 'cpu_usage': '0.0',
@@ -235,10 +410,17 @@ class TestProcess:
                    'memory_usage': '100.0', 'time': '0:14.70', 'command': 'test comand line',
                    }
 
+    # comm with spaces and parentheses
+    process500 = {'pid': '500', 'user': 'root', 'priority': '25', 'niceness': '5', 'virtual_memory': '10240',
+                  'resident_memory': '0', 'shared_memory': '0', 'state': 'R', 'cpu_usage': '0.0',
+                  'memory_usage': '0.0', 'time': '0:02.70', 'command': 'tmux: server) (2 -d',
+                  }
+
     result_vs_pid = [
         (process1, '1'),
         (process4, '4'),
         (process1051, '1051'),
+        (process500, '500'),
     ]
 
     wrong_format_pid = [
@@ -363,6 +545,143 @@ class TestProcess:
 
         assert process.cpu_usage == expected
 
+    @pytest.mark.parametrize('seconds', [0.25, 1.5, 10.0])
+    def test_cpu_usage_timestamp(self, seconds):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        Process._proc_folder = os.path.join(dir_path, 'test_sysinfo')
+        process = Process('1051', timestamp=1000.0)
+
+        # 1000 clock ticks were consumed, in less than a second of /proc/uptime resolution in the first case
+        Process._proc_folder = os.path.join(dir_path, 'test_sysinfo', 'cpu')
+        process.update(timestamp=1000.0 + seconds)
+        assert process.cpu_usage == pytest.approx(100 * 1000 / Process._clock_ticks_per_second / seconds)
+
+    def test_clock(self):
+        first = Process.clock()
+        assert isinstance(first, float)
+        assert Process.clock() >= first
+
+    def test_parse_stat(self):
+        info = Process._parse_stat(b'500 (a) b (c)) S 1 2 3 4 5 64 7 8 9 10 11 12 13 14 -2 -5 3 0 99 4096 7 18446744073709551615')
+        assert info.comm == 'a) b (c)'
+        assert (info.state, info.ppid) == ('S', 1)
+        assert info.flags == 64
+        assert (info.utime, info.stime, info.cutime, info.cstime) == (11, 12, 13, 14)
+        assert (info.priority, info.nice, info.num_threads) == (-2, -5, 3)
+        assert (info.starttime, info.vsize, info.rss) == (99, 4096, 7)
+
+    @pytest.mark.parametrize('data', [b'500 (a) S 1 2', b'500 a S 1 2 3 4 5 64 7 8 9 10 11 12 13 14 -2 -5 3 0 99 4096 7',
+                                      b'500 (a) S 1 2 3 4 5 64 7 8 9 10 x 12 13 14 -2 -5 3 0 99 4096 7'])
+    def test_parse_stat_wrong_format(self, data):
+        with pytest.raises((ValueError, IndexError)):
+            Process._parse_stat(data)
+
+    def test_cmdline_cached(self, get_process):
+        expected, actual = get_process
+        with patch.object(Process, '_read_cmdline') as read_cmdline:
+            actual.update()
+            read_cmdline.assert_not_called()
+        assert actual.command == expected['command']
+
+    def test_cmdline_reread_after_exec(self, get_process):
+        expected, actual = get_process
+        actual._cmdline_key = ('previous-image', actual._starttime)
+        with patch.object(Process, '_read_cmdline') as read_cmdline:
+            actual.update()
+            read_cmdline.assert_called_once()
+
+    def test_status_not_required(self, get_process):
+        expected, actual = get_process
+        Process.set_status_required(False)
+        try:
+            with patch.object(Process, '_parse_status') as read_status:
+                actual.update()
+                read_status.assert_not_called()
+        finally:
+            Process.set_columns(Process.default_columns)
+        assert actual.state == expected['state']
+
+    def test_parse_statm(self):
+        assert Process._parse_statm(b'56371 926 1301 334 0 4724 0\n') == (56371, 926, 1301)
+
+    def test_memory_from_statm(self, get_process):
+        expected, actual = get_process
+        with patch.object(Process, '_parse_status') as parse_status:
+            actual.update()
+            parse_status.assert_not_called()
+        size, resident, shared = Process._parse_statm(actual._read_file('statm'))
+        page = Process._page_size_kb
+        assert (actual.virtual_memory, actual.resident_memory, actual.shared_memory) == \
+               (size * page, resident * page, shared * page)
+
+    def test_columns_files(self, get_process):
+        expected, actual = get_process
+        Process.set_columns(['PID', 'PERCENT_CPU', 'TIME'])
+        try:
+            with patch.object(Process, '_read_file', wraps=actual._read_file) as read_file:
+                actual._cmdline_key = None
+                actual.update()
+        finally:
+            Process.set_columns(Process.default_columns)
+        assert [call.args[0] for call in read_file.call_args_list] == ['stat']
+        assert actual.time == expected['time']
+
+    def test_io_and_pss_columns(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        Process._proc_folder = os.path.join(dir_path, 'test_sysinfo')
+        Process.set_uptime(Uptime())
+        Process.set_memory_info(MemInfo().total_memory)
+
+        assert (Process('1').io_read, Process('1').pss) == (0, 0)
+        Process.set_columns(Process.default_columns + ('IO_READ', 'IO_WRITE', 'M_PSS'))
+        try:
+            process = Process('1')
+        finally:
+            Process.set_columns(Process.default_columns)
+        assert (process.io_read, process.io_write, process.pss) == (48820224, 1097728, 6113)
+
+    def test_restricted_columns(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        Process._proc_folder = os.path.join(dir_path, 'test_sysinfo')
+        Process.set_uptime(Uptime())
+        Process.set_memory_info(MemInfo().total_memory)
+
+        def read_file(process, name):
+            if name in ('io', 'smaps_rollup'):
+                raise PermissionError(13, 'Permission denied')
+            with open(os.path.join(Process._proc_folder, process.pid, name), 'rb') as file:
+                return file.read()
+
+        Process.set_columns(['PID', 'IO_READ', 'M_PSS'])
+        try:
+            with patch.object(Process, '_read_file', read_file):
+                process = Process('1')
+        finally:
+            Process.set_columns(Process.default_columns)
+        assert (process.io_read, process.io_write, process.pss) == (None, None, None)
+        # comm stands for the command line if it is not read
+        assert process.command == 'systemd'
+
+    def test_memory_budget(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        Process._proc_folder = os.path.join(dir_path, 'test_sysinfo')
+        Process.set_uptime(Uptime())
+        Process.set_memory_info(MemInfo().total_memory)
+        Process('1')
+
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        processes = [Process('1') for _ in range(1000)]
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert not hasattr(processes[0], '__dict__')
+        assert processes[0].command is processes[-1].command
+        # with its numbers and unshared strings a process stays within three times the size of its slots, the
+        # budget in bytes depends on the interpreter and is checked by benchmarks/bench_process_memory.py
+        per_process = (after - before - sys.getsizeof(processes)) / len(processes)
+        assert per_process <= 3 * sys.getsizeof(processes[0])
+
     def test_memory_usage(self, get_process):
         expected, actual = get_process
         assert actual.memory_usage == float(expected['memory_usage'])
@@ -420,3 +739,838 @@ class TestProcessesController:
         memory_info = MemInfo()
         processes = ProcessesController(uptime, memory_info.total_memory)
         assert processes.proccesses_number == len(expected)
+
+    def test_update_evicts_and_adds(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ProcessesController(uptime, memory_info.total_memory)
+        assert processes.update_stats == (5, 0, 0)
+
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/03_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+        processes.update()
+        assert sorted(processes.processes_pid) == [15, 18]
+        assert processes.update_stats == (0, 3, 2)
+
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/04_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+        processes.update()
+        assert sorted(processes.processes_pid) == [15, 18, 23568]
+        assert processes.update_stats == (1, 0, 2)
+
+    @pytest.mark.parametrize('folder, expected', folder_vs_processes)
+    def test_persistent_files(self, folder, expected):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        ProcessesController._proc_folder = os.path.join(dir_path, folder)
+        Process._proc_folder = os.path.join(dir_path, folder)
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ProcessesController(uptime, memory_info.total_memory, persistent_files=True)
+        processes.update()
+        try:
+            assert sorted(processes.processes_pid) == sorted(expected)
+            assert processes.update_stats == (0, 0, len(expected))
+        finally:
+            processes.close()
+
+    @pytest.mark.parametrize('scan_threads', [2, 3])
+    def test_scan_threads(self, scan_threads):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ProcessesController(uptime, memory_info.total_memory, scan_threads=scan_threads)
+        try:
+            # new processes are merged in PID order regardless of the sharding
+            assert processes.processes_pid == [1, 2, 3, 15, 18]
+
+            folder = os.path.join(dir_path, 'test_sysinfo/processes/04_processes/')
+            ProcessesController._proc_folder = folder
+            Process._proc_folder = folder
+            processes.update()
+            assert processes.processes_pid == [15, 18, 23568]
+            assert processes.update_stats == (1, 3, 2)
+        finally:
+            processes.close()
+
+    def test_scan_threads_persistent_files(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ProcessesController(uptime, memory_info.total_memory, persistent_files=True, scan_threads=2)
+        try:
+            processes.update()
+            assert processes.processes_pid == [1, 2, 3, 15, 18]
+            assert processes.update_stats == (0, 0, 5)
+        finally:
+            processes.close()
+
+    def test_scan_processes(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ProcessesController(uptime, memory_info.total_memory, scan_processes=2)
+        try:
+            assert processes.processes_pid == [1, 2, 3, 15, 18]
+            process = next(iter(processes.processes))
+            assert (process.pid, process.command, process.priority, process.resident_memory) == \
+                   ('1', '/sbin/init splash', '20', 926 * Process._page_size_kb)
+
+            # statm is parsed by the workers as well
+            with patch.object(Process, '_parse_statm', wraps=Process._parse_statm) as parse_statm:
+                processes.update()
+                parse_statm.assert_not_called()
+            process = next(iter(processes.processes))
+            assert (process.virtual_memory, process.resident_memory, process.shared_memory) == \
+                   (56371 * Process._page_size_kb, 926 * Process._page_size_kb, 1301 * Process._page_size_kb)
+
+            folder = os.path.join(dir_path, 'test_sysinfo/processes/04_processes/')
+            ProcessesController._proc_folder = folder
+            Process._proc_folder = folder
+            processes.update()
+            assert processes.processes_pid == [15, 18, 23568]
+            assert processes.update_stats == (1, 3, 2)
+        finally:
+            processes.close()
+
+    def test_scan_processes_truncated_status(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        collector = SharedMemoryCollector(2)
+        try:
+            # status of PID 3 was cut short by its exit
+            Process._proc_folder = os.path.join(dir_path, 'test_sysinfo/processes/08_processes')
+            records = {pid: stat_info for pid, stat_info, _, _ in collector.collect(['1', '3'])}
+            assert records['1'].comm == 'systemd'
+            assert records['3'] is None
+
+            # the kernel thread has no memory figures
+            Process._proc_folder = os.path.join(dir_path, 'test_sysinfo/processes/07_processes')
+            records = {pid: status for pid, _, status, _ in collector.collect(['1', '2'])}
+            assert records['2']['Uid'] == 0
+            assert (records['2']['VmSize'], records['2']['VmRSS']) == (0, 0)
+        finally:
+            collector.close()
+
+    def test_scan_processes_no_pids(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ProcessesController(uptime, memory_info.total_memory, scan_processes=2)
+        try:
+            owner = os.stat(os.path.join(folder, '1')).st_uid
+            processes.set_user_filter(owner + 1)
+            processes.update()
+            assert processes.processes_pid == []
+            assert asyncio.run(processes.aupdate()) is None
+            assert processes.update_stats == (0, 0, 0)
+        finally:
+            processes.close()
+
+    def test_uid_from_directory(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        with patch.object(Process, '_parse_status', wraps=Process._parse_status) as parse_status:
+            Process.set_status_required(False)
+            try:
+                processes = ProcessesController(uptime, memory_info.total_memory)
+            finally:
+                Process.set_columns(Process.default_columns)
+            parse_status.assert_not_called()
+
+        for process in processes.processes:
+            assert process.uid == os.stat(os.path.join(folder, process.pid)).st_uid
+
+    def test_user_filter(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ProcessesController(uptime, memory_info.total_memory)
+        owner = os.stat(os.path.join(folder, '1')).st_uid
+
+        processes.set_user_filter(owner + 1)
+        processes.update()
+        assert processes.processes_pid == []
+
+        processes.set_user_filter(owner)
+        processes.update()
+        assert processes.processes_pid == [1, 2, 3, 15, 18]
+
+    @pytest.mark.parametrize('persistent_files', [False, True])
+    def test_kernel_thread_without_mm(self, persistent_files):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/07_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+        kthread_files = {os.path.join(folder, '2', name) for name in ('io', 'smaps_rollup')}
+        builtin_open = open
+        os_open = os.open
+
+        # files of the kernel thread need its memory map, which it does not have
+        def esrch_open(file, *args, **kwargs):
+            if os.path.normpath(file) in kthread_files:
+                raise ProcessLookupError(errno.ESRCH, 'No such process')
+            return builtin_open(file, *args, **kwargs)
+
+        def esrch_os_open(path, flags, mode=0o777, *, dir_fd=None):
+            if dir_fd is not None and os.path.join(os.readlink(f'/proc/self/fd/{dir_fd}'), path) in kthread_files:
+                raise ProcessLookupError(errno.ESRCH, 'No such process')
+            return os_open(path, flags, mode, dir_fd=dir_fd)
+
+        Process.set_columns(Process.default_columns + ('IO_READ', 'M_PSS'))
+        processes = None
+        try:
+            with patch('builtins.open', esrch_open), patch('os.open', esrch_os_open):
+                processes = ProcessesController(Uptime(), MemInfo().total_memory, persistent_files=persistent_files)
+                processes.update()
+            assert processes.processes_pid == [1, 2]
+            assert processes.kernel_threads_number == 1
+            assert processes.update_stats == (0, 0, 2)
+            systemd, kthreadd = processes.processes
+            assert (systemd.io_read, systemd.pss) == (48820224, 6113)
+            assert (kthreadd.command, kthreadd.io_read, kthreadd.io_write, kthreadd.pss) == \
+                   ('kthreadd', None, None, None)
+            if persistent_files:
+                # the kernel thread is not evicted from the file cache
+                assert processes._file_caches[0].open_files == 4
+        finally:
+            if processes is not None:
+                processes.close()
+            Process.set_columns(Process.default_columns)
+
+    @pytest.mark.parametrize('persistent_files', [False, True])
+    def test_truncated_files(self, persistent_files):
+        # io of PID 2 and status of PID 3 were cut short by their exit
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/08_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        Process.set_columns(Process.default_columns + ('IO_READ',))
+        Process.set_status_required(True)
+        processes = None
+        try:
+            processes = ProcessesController(Uptime(), MemInfo().total_memory, persistent_files=persistent_files)
+            assert processes.processes_pid == [1]
+            processes.update()
+            assert processes.processes_pid == [1]
+            # a standalone process reports the error
+            with pytest.raises(SystemInfoError):
+                Process('2')
+        finally:
+            if processes is not None:
+                processes.close()
+            Process.set_columns(Process.default_columns)
+
+    def test_threads_number(self, tmp_path):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = str(tmp_path) + '/'
+        shutil.copytree(os.path.join(dir_path, 'test_sysinfo/processes/02_processes/'), folder, dirs_exist_ok=True)
+        # pid 2 becomes a kernel thread and pid 15 gets 4 threads
+        for pid, index, value in (('2', 8, str(0x00208040)), ('15', 19, '4')):
+            with open(folder + pid + '/stat') as file:
+                fields = file.read().split(' ')
+            fields[index] = value
+            with open(folder + pid + '/stat', 'w') as file:
+                file.write(' '.join(fields))
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ProcessesController(uptime, memory_info.total_memory)
+        assert (processes.threads_number, processes.kernel_threads_number) == (3, 1)
+        processes.update()
+        assert (processes.threads_number, processes.kernel_threads_number) == (3, 1)
+
+        columnar = ColumnarProcessesController(uptime, memory_info.total_memory)
+        assert (columnar.threads_number, columnar.kernel_threads_number) == (3, 1)
+
+    def test_adaptive_sampling(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ProcessesController(uptime, memory_info.total_memory, adaptive_sampling=True)
+        processes.set_pinned_pids([1])
+        updated = []
+        for _ in range(28):
+            processes.update()
+            updated.append(processes.update_stats.updated)
+
+        # idle processes back off to every 2nd, 4th and 8th update, the pinned one is always refreshed
+        assert updated == [5, 5, 5, 1, 5, 1, 5, 1, 5, 1, 1, 1, 5, 1, 1, 1, 5, 1, 1, 1, 5, 1, 1, 1, 1, 1, 1, 1]
+        assert processes.processes_pid == [1, 2, 3, 15, 18]
+
+    def test_adaptive_sampling_busy_process(self, tmp_path):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = str(tmp_path) + '/'
+        shutil.copytree(os.path.join(dir_path, 'test_sysinfo/processes/02_processes/'), folder, dirs_exist_ok=True)
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ProcessesController(uptime, memory_info.total_memory, adaptive_sampling=True)
+        with open(folder + '15/stat') as file:
+            fields = file.read().split(' ')
+        for _ in range(12):
+            # utime grows on every update
+            fields[13] = str(int(fields[13]) + 1)
+            with open(folder + '15/stat', 'w') as file:
+                file.write(' '.join(fields))
+            processes.update()
+
+        process = processes._processes['15']
+        assert process.idle_samples == 0
+        assert process.samples_to_skip == 0
+        assert processes._processes['18'].idle_samples >= ProcessesController._idle_samples
+
+    @pytest.mark.parametrize('options', [{}, {'scan_threads': 2}, {'scan_processes': 2}, {'detail_rows': 1}])
+    def test_pid_reuse(self, options):
+        # busy host: PID of a compiler wraps around to a short-lived shell between two updates
+        class SimClock:
+            now = 1000.0
+
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/05_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        with patch.object(Process, 'clock', lambda: SimClock.now):
+            processes = ProcessesController(Uptime(), MemInfo().total_memory, **options)
+            try:
+                processes.set_sort_key('cpu_usage', reverse=True)
+                old = processes._processes['32766']
+                assert old.identity == ('32766', 5000)
+
+                folder = os.path.join(dir_path, 'test_sysinfo/processes/06_processes/')
+                ProcessesController._proc_folder = folder
+                Process._proc_folder = folder
+                SimClock.now = 1001.0
+                with patch.object(Process, '_parse_status', wraps=Process._parse_status) as parse_status:
+                    processes.update()
+            finally:
+                processes.close()
+
+        new = processes._processes['32766']
+        assert new.identity == ('32766', 99990)
+        # the owner of /proc/[pid] is kept, status is not read for it
+        owner = os.stat(os.path.join(folder, '32766')).st_uid
+        assert (new.uid, new.user) == (owner, pwd.getpwuid(owner).pw_name)
+        parse_status.assert_not_called()
+        # no CPU usage history of the new process, instead of a negative spike against the compiler's ticks
+        assert new.cpu_usage == 0.0
+        assert new.command in ('sh -c logrotate', 'sh')
+        assert processes._processes['32767'].cpu_usage == pytest.approx(50 * 100 / Process._clock_ticks_per_second)
+
+    def test_pid_reuse_standalone(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        Process._proc_folder = os.path.join(dir_path, 'test_sysinfo/processes/05_processes')
+        Process.set_uptime(Uptime())
+        Process.set_memory_info(MemInfo().total_memory)
+        process = Process('32766')
+        assert (process.uid, process.command) == (1000, 'cc1 -quiet main.c')
+
+        Process._proc_folder = os.path.join(dir_path, 'test_sysinfo/processes/06_processes')
+        process.update()
+        assert (process.uid, process.command, process.cpu_usage) == (0, 'sh -c logrotate', 0.0)
+
+    @pytest.mark.parametrize('options', [{}, {'scan_threads': 2}, {'scan_processes': 2}])
+    def test_time_budget(self, options):
+        class SimClock:
+            now = 1000.0
+
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        with patch.object(Process, 'clock', lambda: SimClock.now), \
+                patch.object(ProcessesController, '_budget_batch', 2):
+            processes = ProcessesController(Uptime(), MemInfo().total_memory, **options)
+            try:
+                scanned = []
+                for _ in range(3):
+                    SimClock.now += 1
+                    # the deadline has passed, so a single batch is scanned by every update
+                    processes.update(deadline=SimClock.now - 0.5)
+                    assert processes.update_stats.updated == 2
+                    assert processes.proccesses_number == 5
+                    scanned.append(sorted(process.pid for process in processes.processes if not process.sample_age))
+            finally:
+                processes.close()
+
+            # the scan resumes where the previous update stopped
+            assert scanned == [['1', '2'], ['15', '3'], ['1', '18']]
+            ages = {process.pid: process.sample_age for process in processes.processes}
+            assert ages == {'1': 0.0, '2': 2.0, '3': 1.0, '15': 1.0, '18': 0.0}
+
+    @pytest.mark.parametrize('options', [{}, {'scan_processes': 2}])
+    def test_time_budget_aupdate(self, options):
+        class SimClock:
+            now = 1000.0
+
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        with patch.object(Process, 'clock', lambda: SimClock.now):
+            processes = ProcessesController(Uptime(), MemInfo().total_memory, **options)
+            try:
+                SimClock.now += 1
+                asyncio.run(processes.aupdate(concurrency=1, batch_size=2, deadline=SimClock.now - 0.5))
+                assert processes.update_stats.updated == 2
+                assert processes.proccesses_number == 5
+                SimClock.now += 1
+                asyncio.run(processes.aupdate(concurrency=1, batch_size=2, deadline=SimClock.now - 0.5))
+                assert processes.update_stats.updated == 2
+            finally:
+                processes.close()
+
+            ages = {process.pid: process.sample_age for process in processes.processes}
+            assert ages == {'1': 1.0, '2': 1.0, '3': 0.0, '15': 0.0, '18': 2.0}
+
+    def test_time_budget_pid_reuse(self, tmp_path):
+        class SimClock:
+            now = 1000.0
+
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = str(tmp_path / 'proc') + '/'
+        shutil.copytree(os.path.join(dir_path, 'test_sysinfo/processes/05_processes/'), folder)
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        with patch.object(Process, 'clock', lambda: SimClock.now), \
+                patch.object(ProcessesController, '_budget_batch', 1):
+            processes = ProcessesController(Uptime(), MemInfo().total_memory)
+            try:
+                SimClock.now += 1
+                processes.update(deadline=SimClock.now - 0.5)
+                assert processes._processes['32766'].command == 'cc1 -quiet main.c'
+
+                # the compiler exits and a shell gets its PID; the old directory is kept, so its inode is not reused
+                os.rename(folder + '32766', str(tmp_path / 'exited'))
+                shutil.copytree(os.path.join(dir_path, 'test_sysinfo/processes/06_processes/32766'), folder + '32766')
+                SimClock.now += 1
+                processes.update(deadline=SimClock.now - 0.5)
+                # 32766 is skipped by this update, its old row is dropped instead of shown for the shell
+                assert processes.processes_pid == [32767]
+                assert processes.update_stats == ProcessesController.UpdateStats(0, 1, 1)
+
+                SimClock.now += 1
+                processes.update(deadline=SimClock.now - 0.5)
+                new = processes._processes['32766']
+                assert new.identity == ('32766', 99990)
+                assert (new.command, new.cpu_usage) == ('sh -c logrotate', 0.0)
+            finally:
+                processes.close()
+
+    def test_two_phase_update(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        with patch.object(Process, '_parse_statm', wraps=Process._parse_statm) as parse_statm:
+            processes = ProcessesController(uptime, memory_info.total_memory, detail_rows=2)
+            assert parse_statm.call_count == 2
+
+            processes.set_sort_key('cpu_usage', reverse=True)
+            processes.set_pinned_pids([18])
+            processes.update()
+            assert parse_statm.call_count == 5
+
+        commands = {process.pid: process.command for process in processes.processes}
+        # processes read only in the first phase show comm instead of the command line
+        assert commands == {'1': '/sbin/init splash', '2': '/sbin/init splash', '3': 'systemd', '15': 'systemd',
+                            '18': '/sbin/init splash'}
+        for process in processes.processes:
+            # memory figures come from stat if statm was not read
+            assert process.resident_memory == 926 * Process._page_size_kb
+
+    def test_two_phase_update_exec(self, tmp_path):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = str(tmp_path) + '/'
+        shutil.copytree(os.path.join(dir_path, 'test_sysinfo/processes/02_processes/'), folder, dirs_exist_ok=True)
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        processes = ProcessesController(Uptime(), MemInfo().total_memory, detail_rows=1)
+        processes.set_pinned_pids(['18'])
+        processes.update()
+        assert processes._processes['18'].command == '/sbin/init splash'
+
+        # process scrolls off the screen and runs exec(), starttime stays the same
+        processes.set_pinned_pids([])
+        with open(folder + '18/stat') as file:
+            stat = file.read()
+        with open(folder + '18/stat', 'w') as file:
+            file.write(stat.replace('(systemd)', '(make)'))
+        processes.update()
+        assert processes._processes['18'].command == 'make'
+
+    def test_sort_key(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/04_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ProcessesController(uptime, memory_info.total_memory)
+        processes._processes['18'].cpu_usage = 50.0
+        processes._processes['23568'].cpu_usage = 10.0
+        processes.set_sort_key('cpu_usage', reverse=True)
+        assert [process.pid for process in processes.processes] == ['18', '23568', '15']
+        processes.set_sort_key(None)
+        assert [process.pid for process in processes.processes] == ['15', '18', '23568']
+
+    def test_user_names(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        with patch('src.sysinfo.pwd.getpwuid', side_effect=TestUserNames.getpwuid) as getpwuid:
+            user_names = UserNames()
+            processes = ProcessesController(uptime, memory_info.total_memory, user_names=user_names)
+            processes.update()
+            Process.set_user_names(None)
+
+        for process in processes.processes:
+            assert process.user == user_names.name(process.uid)
+        # all fixture processes have the same owner
+        assert getpwuid.call_count == 1
+
+    def test_proc_events_not_available(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        with patch.object(ProcConnector, '__init__', side_effect=PermissionError):
+            processes = ProcessesController(uptime, memory_info.total_memory, proc_events=True)
+        assert not processes.proc_events
+        assert processes.processes_pid == [1, 2, 3, 15, 18]
+
+    def test_apply_events(self, tmp_path):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = str(tmp_path) + '/'
+        shutil.copytree(os.path.join(dir_path, 'test_sysinfo/processes/04_processes/'), folder, dirs_exist_ok=True)
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ProcessesController(uptime, memory_info.total_memory)
+        del processes._uids['23568']
+        process = processes._processes['15']
+        command = process.command
+        # exec() of a binary with the same name keeps comm and starttime, the cached command line is shown
+        with open(folder + '15/cmdline', 'wb') as file:
+            file.write(b'systemd\x00--user\x00')
+        process.update()
+        assert process.command == command
+
+        events = [ProcConnector.Event(ProcConnector.PROC_EVENT_FORK, 23568, 23568),
+                  ProcConnector.Event(ProcConnector.PROC_EVENT_FORK, 23569, 23568),  # thread
+                  ProcConnector.Event(ProcConnector.PROC_EVENT_FORK, 40000, 40000),  # exited meanwhile
+                  ProcConnector.Event(ProcConnector.PROC_EVENT_EXEC, 15, 15),
+                  ProcConnector.Event(ProcConnector.PROC_EVENT_EXIT, 18, 18),
+                  ProcConnector.Event(ProcConnector.PROC_EVENT_EXIT, 23570, 23568)]  # thread
+        pids = processes._apply_events(events)
+        assert sorted(pids, key=int) == ['15', '23568']
+        assert pids['23568'] == os.stat(os.path.join(folder, '23568')).st_uid
+        # fork of a known PID means the process exited and the PID was reused
+        assert processes._pid_reused('23568') and not processes._pid_reused('15')
+        process.update()
+        assert process.command == 'systemd --user'
+
+    @pytest.mark.parametrize('persistent_files', [False, True])
+    def test_aupdate(self, persistent_files):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ProcessesController(uptime, memory_info.total_memory, persistent_files=persistent_files)
+        try:
+            asyncio.run(processes.aupdate(concurrency=2, batch_size=2))
+            assert processes.processes_pid == [1, 2, 3, 15, 18]
+            assert processes.update_stats == (0, 0, 5)
+        finally:
+            processes.close()
+
+    @pytest.mark.parametrize('persistent_files, files_opened', [(False, [15, 10]), (True, [20, 5])])
+    def test_stage_timer(self, persistent_files, files_opened):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        timer = StageTimer()
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ProcessesController(uptime, memory_info.total_memory, persistent_files=persistent_files,
+                                        stage_timer=timer)
+        try:
+            processes.update()
+            assert set(timer.names) == {'enumerate', 'read', 'stat parse', 'files opened', 'scan'}
+            summary = timer.summary()
+            assert all(stats['samples'] == 2 for stats in summary.values())
+            assert [timer.percentile('files opened', 0), summary['files opened']['max']] == sorted(files_opened)
+            assert summary['scan']['max'] >= summary['stat parse']['max'] > 0
+
+            Process.set_status_required(True)
+            processes.update()
+            assert 'status parse' in timer.names
+        finally:
+            processes.close()
+            Process.set_columns(Process.default_columns)
+            Process.set_stage_timer(None)
+
+
+class TestProcConnector:
+    @staticmethod
+    def message(what, *ids):
+        data = struct.pack('=IIQ', what, 0, 123456789) + struct.pack(f'={len(ids)}I', *ids)
+        cn_msg = struct.pack('=IIIIHH', ProcConnector.CN_IDX_PROC, ProcConnector.CN_VAL_PROC, 0, 0, len(data), 0)
+        return struct.pack('=IHHII', 16 + len(cn_msg) + len(data), 3, 0, 0, 0) + cn_msg + data
+
+    def test_parse_events(self):
+        data = self.message(ProcConnector.PROC_EVENT_FORK, 1, 1, 200, 200) + \
+               self.message(ProcConnector.PROC_EVENT_EXEC, 200, 200) + \
+               self.message(0x80, 200, 200) + \
+               self.message(ProcConnector.PROC_EVENT_EXIT, 201, 200, 0, 9, 1, 1)
+        assert ProcConnector._parse_events(data) == [(ProcConnector.PROC_EVENT_FORK, 200, 200),
+                                                     (ProcConnector.PROC_EVENT_EXEC, 200, 200),
+                                                     (ProcConnector.PROC_EVENT_EXIT, 201, 200)]
+
+    def test_parse_ack(self):
+        assert ProcConnector._parse_events(self.message(ProcConnector.PROC_EVENT_NONE, 0)) == []
+
+    @pytest.mark.parametrize('cut', [1, 16, 40, 52])
+    def test_parse_truncated(self, cut):
+        data = self.message(ProcConnector.PROC_EVENT_EXEC, 1, 1) + self.message(ProcConnector.PROC_EVENT_EXEC, 2, 2)
+        assert ProcConnector._parse_events(data[:-cut]) == [(ProcConnector.PROC_EVENT_EXEC, 1, 1)]
+
+    def test_parse_wrong_connector(self):
+        data = bytearray(self.message(ProcConnector.PROC_EVENT_EXEC, 1, 1))
+        data[16] = 7  # cn_msg idx
+        assert ProcConnector._parse_events(bytes(data)) == []
+
+
+class TestProcessTable:
+    @pytest.fixture(params=[False, True])
+    def table(self, request):
+        if request.param:
+            pytest.importorskip('numpy')
+        table = ProcessTable(use_numpy=request.param)
+        for pid, cpu_ticks in [('1', 0), ('2', 50), ('3', 10)]:
+            slot = table.add(pid)
+            table.column('ticks')[slot] = cpu_ticks
+            table.column('state')[slot] = ord('S')
+        return table
+
+    def test_add_remove(self, table):
+        assert sorted(table.pids) == ['1', '2', '3']
+        table.remove('2')
+        assert len(table) == 2
+        # free slot is reused
+        assert table.add('4') == 1
+        assert table.column('pid')[1] == 4
+
+    def test_update_cpu_usage(self, table):
+        table.update_cpu_usage(2, 100)
+        assert list(table.column('cpu')) == [0.0, 25.0, 5.0]
+
+    def test_sorted_slots(self, table):
+        table.update_cpu_usage(1, 100)
+        table.remove('3')
+        assert table.sorted_slots('cpu', reverse=True) == [1, 0]
+
+    def test_filter_slots(self, table):
+        table.column('state')[table.slot('3')] = ord('R')
+        table.remove('1')
+        assert table.filter_slots('state', ord('S')) == [table.slot('2')]
+
+    def test_tie_order(self, table):
+        # slot 0 is reused by a higher PID, ties are in PID order with both backends and in both directions
+        table.remove('1')
+        table.add('9')
+        assert [table.column('pid')[slot] for slot in table.sorted_slots('state')] == [2, 3, 9]
+        assert [table.column('pid')[slot] for slot in table.sorted_slots('state', reverse=True)] == [2, 3, 9]
+        table.column('state')[table.slot('3')] = ord('R')
+        assert [table.column('pid')[slot] for slot in table.sorted_slots('state', reverse=True)] == [2, 9, 3]
+        assert [table.column('pid')[slot] for slot in table.filter_slots('state', ord('S'))] == [2, 9]
+
+
+class TestColumnarProcessesController:
+    def test_processes(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ColumnarProcessesController(uptime, memory_info.total_memory)
+        assert sorted(processes.processes_pid) == [1, 2, 3, 15, 18]
+        assert processes.update_stats == (5, 0, 0)
+
+        row = next(pr for pr in processes.processes if pr.pid == '1')
+        assert (row.priority, row.niceness, row.state, row.command) == ('20', '0', 'S', '/sbin/init splash')
+        page = Process._page_size_kb
+        assert (row.virtual_memory, row.resident_memory, row.shared_memory) == (56371 * page, 926 * page, 1301 * page)
+
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/04_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+        processes.update()
+        assert sorted(processes.processes_pid) == [15, 18, 23568]
+        assert processes.update_stats == (1, 3, 2)
+
+    @pytest.mark.parametrize('use_numpy', [False, True])
+    def test_sort_and_filter(self, use_numpy):
+        if use_numpy:
+            pytest.importorskip('numpy')
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        processes = ColumnarProcessesController(Uptime(), MemInfo().total_memory, use_numpy=use_numpy)
+        resident = {row.pid: row.resident_memory for row in processes.processes}
+        processes.set_sort_key('resident_memory', reverse=True)
+        rows = list(processes.processes)
+        assert [row.pid for row in rows] == sorted(resident, key=lambda pid: (-resident[pid], int(pid)))
+        assert [row.resident_memory for row in rows] == sorted(resident.values(), reverse=True)
+
+        owner = os.stat(os.path.join(folder, '1')).st_uid
+        processes.set_user_filter(owner + 1)
+        assert list(processes.processes) == []
+        processes.set_user_filter(owner)
+        assert [row.pid for row in processes.processes] == [row.pid for row in rows]
+        processes.set_sort_key(None)
+        assert [row.pid for row in processes.processes] == ['1', '2', '3', '15', '18']
+        with pytest.raises(ValueError):
+            processes.set_sort_key('io_read')
+
+    def test_pid_reuse(self):
+        class SimClock:
+            now = 1000.0
+
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/05_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        with patch.object(Process, 'clock', lambda: SimClock.now):
+            processes = ColumnarProcessesController(Uptime(), MemInfo().total_memory)
+
+            folder = os.path.join(dir_path, 'test_sysinfo/processes/06_processes/')
+            ProcessesController._proc_folder = folder
+            Process._proc_folder = folder
+            SimClock.now = 1001.0
+            processes.update()
+
+        rows = {row.pid: row for row in processes.processes}
+        assert (rows['32766'].cpu_usage, rows['32766'].command) == (0.0, 'sh -c logrotate')
+        assert rows['32767'].cpu_usage == pytest.approx(50 * 100 / Process._clock_ticks_per_second)
+
+
+class TestSnapshotCollector:
+    @pytest.fixture()
+    def collector(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/02_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+
+        uptime = Uptime()
+        memory_info = MemInfo()
+        processes = ProcessesController(uptime, memory_info.total_memory)
+        return SnapshotCollector(Cpu(), memory_info, uptime, LoadAverage(), processes)
+
+    def test_snapshot(self, collector):
+        snapshot = collector.snapshot
+        assert snapshot.processes_number == 5
+        assert [row.pid for row in snapshot.processes] == ['1', '2', '3', '15', '18']
+        assert snapshot.processes[0].command == '/sbin/init splash'
+        assert isinstance(snapshot.cpu_usage, tuple)
+
+    def test_update(self, collector):
+        old = collector.snapshot
+
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        folder = os.path.join(dir_path, 'test_sysinfo/processes/04_processes/')
+        ProcessesController._proc_folder = folder
+        Process._proc_folder = folder
+        new = collector.update()
+
+        assert collector.snapshot is new
+        assert new.timestamp >= old.timestamp
+        # the old snapshot is not affected by the update
+        assert [row.pid for row in old.processes] == ['1', '2', '3', '15', '18']
+        assert SnapshotCollector.diff(old, new) == (['23568'], ['1', '2', '3'], [])
+
+    def test_aupdate(self, collector):
+        new = asyncio.run(collector.aupdate())
+        assert collector.snapshot is new
+        assert SnapshotCollector.diff(new, new) == ([], [], [])
+
+    def test_time_budget(self, collector):
+        processes = collector._sources[-1]
+        budgeted = SnapshotCollector(Cpu(), MemInfo(), Uptime(), LoadAverage(), processes, time_budget=0.5)
+        with patch.object(processes, 'update', wraps=processes.update) as update:
+            snapshot = budgeted.update()
+        assert update.call_args.kwargs['deadline'] == snapshot.timestamp + 0.5
+
+    def test_diff_changed(self, collector):
+        old = collector.snapshot
+        rows = tuple(row._replace(cpu_usage=50.0) if row.pid == '15' else row for row in old.processes)
+        assert SnapshotCollector.diff(old, old._replace(processes=rows)) == ([], [], ['15'])